@@ -1,8 +1,21 @@
+import os
 import sqlite3
 import re
-import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from langchain_openai import AzureChatOpenAI
+from db_pool import get_pool, bootstrap, data_version
+from answer_cache import AnswerCache
+import schema_catalog
+import table_index
+import index_advisor
+import history_store
+from log_writer import get_log_writer
+import query_guard
+import sql_repair
+import result_engine
+import tracing
+import llm_backends
 from langchain.prompts import PromptTemplate
 
 # --- Helper Function ---
@@ -25,119 +38,212 @@ endpoint = "ENDPOINT PLACEHOLDER"
 deployment = "gpt-4o-mini"  
 subscription_key = "API KEY PLACEHOLDER"  
 
-# Create two LLM instances:
-# One for schema summary generation (with higher max_tokens)
-llm_summary = AzureChatOpenAI(
+# "azure", or "fake" for the deterministic offline model in llm_backends.py (no credentials needed)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "azure")
+azure_settings = dict(
     azure_endpoint=endpoint,
     deployment_name=deployment,
     api_key=subscription_key,
     api_version="2024-05-01-preview",
     temperature=0,
-    max_tokens=400,  # Enough for a ~200-word summary
 )
 
+# Create two LLM instances:
+# One for schema summary generation (with higher max_tokens, enough for a ~200-word summary)
+llm_summary = llm_backends.create_llm(LLM_BACKEND, max_tokens=400, **azure_settings)
+
 # One for all other tasks (SQL generation and final answer)
-llm_general = AzureChatOpenAI(
-    azure_endpoint=endpoint,
-    deployment_name=deployment,
-    api_key=subscription_key,
-    api_version="2024-05-01-preview",
-    temperature=0,
-    max_tokens=300,
-)
+llm_general = llm_backends.create_llm(LLM_BACKEND, max_tokens=300, **azure_settings)
 
 # Database paths
 DB_PATH = "mydatabase.db"         # Main database with user data(Change here to shift to in memory database)
 MEMORY_DB_PATH = "memory.db"       # Used for caching schema summary and logging interactions
+# Note: ":memory:" gives one shared in-memory database per process (see db_pool.resolve_uri).
+# Give MEMORY_DB_PATH a distinct name, e.g. "file:memorylogs?mode=memory&cache=shared", when doing the same there.
+
+# Memory database tables, created once per process (see init_databases)
+MEMORY_DB_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS table_summaries (
+        table_name TEXT PRIMARY KEY,
+        ddl_hash TEXT,
+        summary TEXT,
+        last_updated TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sql_cache (
+        question_key TEXT PRIMARY KEY,
+        schema_hash TEXT,
+        question TEXT,
+        sql_query TEXT,
+        created_at REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS memory_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        user_query TEXT,
+        sql_query TEXT,
+        sql_result TEXT,
+        final_answer TEXT
+    )
+    """,
+]
+
+# Question -> SQL and (question, SQL, data version) -> answer caches (see answer_cache.AnswerCache)
+answer_cache = AnswerCache(MEMORY_DB_PATH)
+
+def init_databases(memory_db_path=MEMORY_DB_PATH):
+    """
+    Creates the memory database tables. Safe to call repeatedly; the DDL only runs
+    the first time per process.
+    """
+    bootstrap(memory_db_path, MEMORY_DB_SCHEMA)
+    history_store.init_history(memory_db_path)
 
 # --- Schema Functions ---
+def get_schema_snapshot(db_path=DB_PATH):
+    """
+    Retrieves the current schema snapshot (schema text, hash and per-table DDL).
+    Only rebuilt when PRAGMA schema_version changes (see schema_catalog.get_snapshot).
+    """
+    return schema_catalog.get_snapshot(db_path)
+
 def get_schema(db_path=DB_PATH):
     """
     Retrieves the current database schema from the SQLite database.
-    To ensure consistency, sort the schema lines.
+    To ensure consistency, the schema lines are sorted.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table'")
-    schema_lines = [row[0] for row in cursor.fetchall() if row[0] is not None]
-    conn.close()
-    # Sort the lines to reduce false mismatches due to order variations.
-    return "\n".join(sorted(schema_lines))
+    return get_schema_snapshot(db_path).schema
 
 def compute_schema_hash(schema: str) -> str:
     """
     Computes a SHA256 hash of the schema string.
     """
-    return hashlib.sha256(schema.encode('utf-8')).hexdigest()
+    return schema_catalog.hash_text(schema)
 
 # --- Schema Cache Handling ---
-def get_cached_schema_summary(current_schema: str) -> str:
+# Per-table summaries for the most recent schema hash, so unchanged schemas skip memory.db entirely
+_summary_cache = {"schema_hash": None, "summaries": None}
+
+def get_table_summaries(snapshot) -> dict:
+    """
+    Returns a summary for every user table, cached per table in memory.db.
+    Each table's summary is keyed by the hash of its CREATE TABLE statement, so only
+    new or changed tables are sent to the LLM; the rest are reused as-is.
+    """
+    if _summary_cache["schema_hash"] == snapshot.schema_hash:
+        return _summary_cache["summaries"]
+    tables = schema_catalog.user_tables(snapshot)
+    ddl_hashes = {name: compute_schema_hash(snapshot.tables[name]) for name in tables}
+    init_databases()
+    with get_pool(MEMORY_DB_PATH).connection() as conn:
+        cached = dict(
+            (row[0], (row[1], row[2]))
+            for row in conn.execute("SELECT table_name, ddl_hash, summary FROM table_summaries")
+        )
+    summaries = {name: cached[name][1] for name in tables if name in cached and cached[name][0] == ddl_hashes[name]}
+    missing = [name for name in tables if name not in summaries]
+    if missing:
+        # Generate outside the pooled connection so the LLM calls don't hold it.
+        generated = generate_table_summaries([snapshot.tables[name] for name in missing])
+        now = datetime.now().isoformat()
+        with get_pool(MEMORY_DB_PATH).connection() as conn:
+            conn.executemany("""
+                INSERT INTO table_summaries (table_name, ddl_hash, summary, last_updated)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    ddl_hash = excluded.ddl_hash,
+                    summary = excluded.summary,
+                    last_updated = excluded.last_updated
+            """, [(name, ddl_hashes[name], summary, now) for name, summary in zip(missing, generated)])
+            conn.commit()
+        summaries.update(zip(missing, generated))
+    _summary_cache.update(schema_hash=snapshot.schema_hash, summaries=summaries)
+    return summaries
+
+def get_cached_schema_summary(snapshot, tables=None) -> str:
     """
-    Checks if a cached schema summary exists for the current schema.
-    If the database schema is empty, returns "no_sql".
-    Otherwise, if the hash matches, returns the cached summary.
-    If not, generates a new summary, updates the cache, and returns it.
+    Builds the schema summary from per-table summaries (see get_table_summaries),
+    optionally restricted to a subset of tables.
+    If the database has no tables, returns "no_sql".
     """
     # If there is no schema (i.e., no tables exist), return "no_sql" immediately.
-    if not current_schema.strip():
+    if not schema_catalog.user_tables(snapshot):
         return "no_sql"
-    
-    schema_hash = compute_schema_hash(current_schema)
-    conn = sqlite3.connect(MEMORY_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS schema_cache (
-            id INTEGER PRIMARY KEY,
-            schema_hash TEXT,
-            schema_summary TEXT,
-            last_updated TEXT
-        )
-    """)
-    conn.commit()
-    cursor.execute("SELECT schema_hash, schema_summary FROM schema_cache WHERE id = 1")
-    row = cursor.fetchone()
-    if row and row[0] == schema_hash:
-        cached_summary = row[1]
-        conn.close()
-        return cached_summary
+    return assemble_schema_summary(snapshot, get_table_summaries(snapshot), tables)
+
+def select_tables(user_query: str, snapshot, k=table_index.TOP_K_TABLES) -> list:
+    """
+    Picks the tables relevant to the question with the local table index, so the
+    SQL prompt doesn't grow with the number of loaded tables.
+    """
+    tables = schema_catalog.user_tables(snapshot)
+    index = table_index.get_index(DB_PATH)
+    index.sync(snapshot, tables)
+    return index.select(user_query, tables, k)
+
+def detect_relationships(snapshot, tables):
+    """
+    Lists columns shared between tables (same name, ignoring case, spaces and underscores),
+    which are the JOIN candidates the SQL prompt looks for.
+    """
+    owners = {}
+    for table in tables:
+        for column, _ in snapshot.columns.get(table, []):
+            owners.setdefault(re.sub(r"[\s_]", "", column.lower()), []).append((table, column))
+    links = []
+    for shared in owners.values():
+        for (left, left_col), (right, right_col) in zip(shared, shared[1:]):
+            if left != right:
+                links.append(f'"{left}"."{left_col}" ~ "{right}"."{right_col}"')
+    return links
+
+def assemble_schema_summary(snapshot, summaries, tables=None) -> str:
+    """
+    Joins per-table summaries into the schema summary passed to generate_sql_query,
+    followed by the locally detected relationships between those tables.
+    """
+    tables = tables if tables is not None else schema_catalog.user_tables(snapshot)
+    parts = [f'Table "{name}": {summaries[name]}' for name in tables]
+    links = detect_relationships(snapshot, tables)
+    if links:
+        parts.append("Potential relationships (shared columns): " + "; ".join(links))
     else:
-        new_summary = generate_schema_summary(current_schema)
-        now = datetime.now().isoformat()
-        if row:
-            cursor.execute("""
-                UPDATE schema_cache
-                SET schema_hash = ?, schema_summary = ?, last_updated = ?
-                WHERE id = 1
-            """, (schema_hash, new_summary, now))
-        else:
-            cursor.execute("""
-                INSERT INTO schema_cache (id, schema_hash, schema_summary, last_updated)
-                VALUES (1, ?, ?, ?)
-            """, (schema_hash, new_summary, now))
-        conn.commit()
-        conn.close()
-        return new_summary
+        parts.append("No clear relationships detected.")
+    return "\n".join(parts)
 
 # --- Prompt Templates and Chains ---
 
-# Schema Summary Prompt (unchanged)
-schema_summary_prompt = PromptTemplate(
-    input_variables=["schema"],
+# Table Summary Prompt (one table per call, so uploads only summarize what changed)
+table_summary_prompt = PromptTemplate(
+    input_variables=["table"],
     template=(
-        "You are an expert database schema analyst. Given the following database schema, create a concise summary (less than 400 tokens) that highlights:"
-        "- Table names and their inferred purposes (based on column names if unclear)."
+        "You are an expert database schema analyst. Given the following table definition, create a concise summary (less than 150 tokens) that highlights:"
+        "- The table name and its inferred purpose (based on column names if unclear)."
         "- Key columns for queries (e.g., identifiers like 'Id', numerical values like 'Salary', dates like 'Hire Date', text filters like 'Country')."
-        "- Potential relationships between tables. Prioritize identifying columns that could act as foreign keys (e.g., 'Id' matching 'EmployeeId', 'Country' across tables) or shared attributes (e.g., 'Name' vs 'Full Name'). If no clear relationships exist, state 'No clear relationships detected.'"
+        "- Columns that could act as keys for joining with other tables (e.g., 'Id', 'EmployeeId', 'Country')."
         "- Data types critical for query syntax (e.g., INTEGER, TEXT), especially for columns used in calculations or comparisons."
-        "Use exact column names, enclosing those with spaces or special characters in double quotes. Focus on details essential for accurate SQL query generation, especially for JOINs, aggregations, and filters. If token limit nears, prioritize completing relationship descriptions over less critical details."
-        "Schema:{schema}"
-        "Schema Summary:"
+        "Use exact column names, enclosing those with spaces or special characters in double quotes. Focus on details essential for accurate SQL query generation, especially for JOINs, aggregations, and filters."
+        "Table:{table}"
+        "Table Summary:"
     )
 )
 
-def generate_schema_summary(schema: str) -> str:
-    generated = schema_summary_prompt | llm_summary
-    return extract_text(generated.invoke({"schema": schema}))
+table_summary_chain = table_summary_prompt | llm_summary
+
+@tracing.traced("agent", "table_summaries")
+def generate_table_summaries(tables: list) -> list:
+    """
+    Summarizes each CREATE TABLE statement; the LLM calls run concurrently.
+    """
+    generated = table_summary_chain.batch([{"table": table} for table in tables])
+    tracing.count("agent", "llm_calls", len(tables))
+    for result in generated:
+        tracing.record_tokens("agent", "table_summaries", result)
+    return [extract_text(result) for result in generated]
 
 # Updated SQL Generation Prompt
 sql_generation_prompt = PromptTemplate(
@@ -161,12 +267,58 @@ sql_generation_prompt = PromptTemplate(
 
 sql_generation_chain = sql_generation_prompt | llm_general
 
-def generate_sql_query(user_query: str, schema_summary: str) -> str:
-    generated = sql_generation_chain.invoke({"question": user_query, "schema_summary": schema_summary})
+def clean_sql(generated) -> str:
     sql_query = extract_text(generated)
     # Remove any markdown formatting if present.
-    sql_query = re.sub(r"```(sql)?", "", sql_query).strip()
-    return sql_query
+    return re.sub(r"```(sql)?", "", sql_query).strip()
+
+@tracing.traced("agent", "generate_sql")
+def generate_sql_query(user_query: str, schema_summary: str) -> str:
+    generated = sql_generation_chain.invoke({"question": user_query, "schema_summary": schema_summary})
+    tracing.count("agent", "llm_calls")
+    tracing.record_tokens("agent", "generate_sql", generated)
+    return clean_sql(generated)
+
+@tracing.traced("agent", "generate_sql")
+async def agenerate_sql_query(user_query: str, schema_summary: str) -> str:
+    generated = await sql_generation_chain.ainvoke({"question": user_query, "schema_summary": schema_summary})
+    tracing.count("agent", "llm_calls")
+    tracing.record_tokens("agent", "generate_sql", generated)
+    return clean_sql(generated)
+
+# SQL Retry Prompt (only used when the generated SQL fails to compile and can't be fixed locally, see sql_repair.py)
+sql_retry_prompt = PromptTemplate(
+    input_variables=["question", "schema_summary", "sql_query", "error"],
+    template=(
+        "You are an expert SQL query generator. The SQLite query below was written for the user's question but fails with the error shown. "
+        "Correct it using exact table and column names from the schema summary and the error, enclosing spaces or special characters in double quotes. "
+        "Keep the query's intent; return 'NO_SQL' only if the schema cannot answer the question. Output only the corrected SQL query, no explanations."
+        "Schema Summary: {schema_summary}"
+        "User Question: {question}"
+        "Failed SQL Query: {sql_query}"
+        "Error: {error}"
+        "SQL Query:"
+    )
+)
+
+sql_retry_chain = sql_retry_prompt | llm_general
+
+def retry_inputs(user_query, schema_summary, sql_query, error) -> dict:
+    return {"question": user_query, "schema_summary": schema_summary, "sql_query": sql_query, "error": error}
+
+@tracing.traced("agent", "retry_sql")
+def retry_sql_query(user_query: str, schema_summary: str, sql_query: str, error: str) -> str:
+    generated = sql_retry_chain.invoke(retry_inputs(user_query, schema_summary, sql_query, error))
+    tracing.count("agent", "llm_calls")
+    tracing.record_tokens("agent", "retry_sql", generated)
+    return clean_sql(generated)
+
+@tracing.traced("agent", "retry_sql")
+async def aretry_sql_query(user_query: str, schema_summary: str, sql_query: str, error: str) -> str:
+    generated = await sql_retry_chain.ainvoke(retry_inputs(user_query, schema_summary, sql_query, error))
+    tracing.count("agent", "llm_calls")
+    tracing.record_tokens("agent", "retry_sql", generated)
+    return clean_sql(generated)
 
 # Final Answer Generation Prompt (unchanged)
 final_answer_prompt = PromptTemplate(
@@ -178,7 +330,8 @@ final_answer_prompt = PromptTemplate(
         "2. If the SQL Result indicates 'No relevant data found', then decide based on the nature of the question:\n"
         "   a. For questions about your identity, capabilities, or general conversational topics (e.g., greetings, 'how are you', 'who are you', or 'what is your role'), provide a warm, friendly, and informative response describing your functions as EY's AI agent.\n"
         "   b. For all other off-topic questions, respond exactly with: \"I'm sorry, I cannot answer that question at the moment. Is there any other query I can help with?\"\n\n"
-        "3. Do not include any internal technical details or extraneous information.\n\n"
+        "3. If the SQL Result starts with 'Query budget exceeded', explain politely that the question required too much data processing to answer in time, and suggest narrowing it (for example, a filter, a smaller date range, or fewer tables).\n\n"
+        "4. Do not include any internal technical details or extraneous information.\n\n"
         "User's Question: {question}\n\n"
         "SQL Result: {result}\n\n"
         "Final Answer:"
@@ -186,31 +339,29 @@ final_answer_prompt = PromptTemplate(
 )
 final_answer_chain = final_answer_prompt | llm_general
 
-# --- Memory Logging Function (unchanged) ---
+def set_llms(summary=None, general=None):
+    """
+    Swaps the chat models behind the chains, e.g. for a llm_backends.FakeChatModel
+    in benchmarks. `general` defaults to `summary`.
+    """
+    global llm_summary, llm_general, table_summary_chain, sql_generation_chain, sql_retry_chain, final_answer_chain
+    llm_summary = summary or llm_summary
+    llm_general = general or summary or llm_general
+    table_summary_chain = table_summary_prompt | llm_summary
+    sql_generation_chain = sql_generation_prompt | llm_general
+    sql_retry_chain = sql_retry_prompt | llm_general
+    final_answer_chain = final_answer_prompt | llm_general
+
+# --- Memory Logging Function ---
 def log_memory(user_query, sql_query, sql_result, final_answer, memory_db_path=MEMORY_DB_PATH):
     """
     Logs the interaction details to the memory database.
-    Creates the memory_logs table if it doesn't exist.
-    """
-    conn = sqlite3.connect(memory_db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS memory_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            user_query TEXT,
-            sql_query TEXT,
-            sql_result TEXT,
-            final_answer TEXT
-        )
-    """)
+    The row is only queued here; a background writer inserts queued rows in batched
+    transactions (see log_writer.LogWriter). The memory_logs table is created before
+    the first write (see init_databases).
+    """
     timestamp = datetime.now().isoformat()
-    cursor.execute("""
-        INSERT INTO memory_logs (timestamp, user_query, sql_query, sql_result, final_answer)
-        VALUES (?, ?, ?, ?, ?)
-    """, (timestamp, user_query, sql_query, sql_result, final_answer))
-    conn.commit()
-    conn.close()
+    get_log_writer(memory_db_path, init_databases).log((timestamp, user_query, sql_query, sql_result, final_answer))
 
 # --- New SQL Validation Function ---
 def validate_sql_query(sql_query: str) -> bool:
@@ -228,21 +379,38 @@ def validate_sql_query(sql_query: str) -> bool:
             return False
     return True
 
+# Results that mean the query failed or was stopped; their SQL and answers are never cached
+SQL_ERROR_RESULTS = {"Invalid SQL query detected.", "Table not found.", "SQL syntax error.",
+                     "SQL execution error.", "Database error."} | query_guard.BUDGET_RESULTS
+
 # --- Updated SQL Execution Function ---
 def execute_sql(query: str) -> str:
     """
-    Executes the SQL query on the main database.
-    Returns the result or an error message based on specific SQLite exceptions.
+    Executes the SQL query on the main database over a read-only connection, within
+    the guardrails of query_guard: a LIMIT is added when missing, cross joins of large
+    tables are rejected from their query plan, and the query is stopped when it runs
+    out of time or VM steps.
+    Returns a bounded rendering of the result (see result_engine), a budget result,
+    or an error message based on specific SQLite exceptions.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        conn.close()
-        if not rows:
+        query = query_guard.add_limit(query)
+        with get_pool(DB_PATH, read_only=True).connection() as conn:
+            rejected = query_guard.check_plan(conn, query)
+            if rejected:
+                return rejected
+            budget = query_guard.QueryBudget(conn)
+            try:
+                with budget:
+                    cursor = conn.execute(query)
+                    result = result_engine.collect(cursor)
+            except sqlite3.OperationalError:
+                if budget.violation:
+                    return budget.violation
+                raise
+        if not result.total_rows:
             return "No relevant data found."
-        return str(rows)
+        return result_engine.render(result)
     except sqlite3.OperationalError as e:
         if "no such table" in str(e).lower():
             return "Table not found."
@@ -253,37 +421,234 @@ def execute_sql(query: str) -> str:
     except sqlite3.Error:
         return "Database error."
 
+# --- Pipeline Steps (shared by the sync and async agents) ---
+# Each step is timed as a stage of the "agent" pipeline (see tracing.py, served at /metrics)
+@tracing.traced("agent", "schema")
+def lookup_sql(user_query: str):
+    """
+    Retrieves the schema snapshot and the cached SQL for the question, if any.
+    Returns (snapshot, sql_query or None).
+    """
+    snapshot = get_schema_snapshot()
+    init_databases()
+    return snapshot, answer_cache.get_sql(user_query, snapshot.schema_hash)
+
+@tracing.traced("agent", "schema_summary")
+def build_schema_summary(user_query: str, snapshot) -> str:
+    """
+    Assembles the schema summary for the tables relevant to the question.
+    """
+    return get_cached_schema_summary(snapshot, select_tables(user_query, snapshot))
+
+@tracing.traced("agent", "check_sql")
+def check_sql(sql_query: str, snapshot):
+    """
+    Compiles generated SQL against the live schema (EXPLAIN on a read-only connection)
+    and applies local fixes for quoting and near-miss names (see sql_repair.check).
+    Returns (sql_query, error or None, number of local fixes).
+    """
+    with get_pool(DB_PATH, read_only=True).connection() as conn:
+        return sql_repair.check(conn, sql_query, snapshot)
+
+def needs_check(sql_query: str) -> bool:
+    # NO_SQL and unsafe queries are answered by run_sql without touching the database
+    return sql_query.upper() != "NO_SQL" and validate_sql_query(sql_query)
+
+def count_sql_outcome(sql_query, error, fixes, retries):
+    """
+    Counts how a generated query ended up: compiling as generated (first-attempt
+    success), after local fixes, after an LLM retry, or not at all.
+    """
+    if error or sql_query.upper() == "NO_SQL":
+        outcome = "sql_failed"
+    elif retries:
+        outcome = "sql_fixed_by_retry"
+    elif fixes:
+        outcome = "sql_fixed_locally"
+    else:
+        outcome = "sql_first_attempt_ok"
+    tracing.count("agent", "sql_checked")
+    tracing.count("agent", outcome)
+
+def repair_sql_query(user_query: str, schema_summary: str, snapshot, sql_query: str) -> str:
+    """
+    Validates freshly generated SQL before it runs. Trivial problems are fixed locally;
+    otherwise the LLM gets the precise error for up to SQL_RETRIES more attempts.
+    Returns the query to run (the last attempt if none compiles).
+    """
+    if not needs_check(sql_query):
+        return sql_query
+    sql_query, error, fixes = check_sql(sql_query, snapshot)
+    retries = 0
+    while error and retries < sql_repair.SQL_RETRIES:
+        retries += 1
+        sql_query = retry_sql_query(user_query, schema_summary, sql_query, error)
+        if not needs_check(sql_query):
+            break
+        sql_query, error, more = check_sql(sql_query, snapshot)
+        fixes += more
+    count_sql_outcome(sql_query, error, fixes, retries)
+    return sql_query
+
+@tracing.traced("agent", "execute_sql")
+def run_sql(user_query: str, sql_query: str):
+    """
+    Validates and executes the SQL, or reuses the cached answer if the data hasn't changed.
+    Returns (data_version, cached (sql_result, final_answer) or None, sql_result).
+    """
+    if sql_query.upper() == "NO_SQL":
+        return None, None, "No relevant data found."
+    version = data_version(DB_PATH)
+    cached = answer_cache.get_result(user_query, sql_query, version)
+    if cached:
+        return version, cached, cached[0]
+    if not validate_sql_query(sql_query):
+        return version, None, "Invalid SQL query detected."
+    return version, None, execute_sql(sql_query)
+
+@tracing.traced("agent", "record")
+def record_interaction(user_query, snapshot, sql_query, sql_cached, version, sql_result, final_answer):
+    """
+    Fills the answer caches for successful queries and logs the interaction.
+    """
+    tracing.count("agent", "questions")
+    if sql_result not in SQL_ERROR_RESULTS:
+        # NO_SQL isn't cached: it is also what the model says when it can't place a question, and asking again may work
+        if not sql_cached and sql_query.upper() != "NO_SQL":
+            answer_cache.put_sql(user_query, snapshot.schema_hash, sql_query)
+        # NO_SQL answers depend on the question itself (greetings etc.), so only data answers are shared
+        if version is not None:
+            answer_cache.put_result(user_query, sql_query, version, sql_result, final_answer)
+    log_memory(user_query, sql_query, sql_result, final_answer)
+    # Indexes for the columns the logged queries keep filtering on are built in the background
+    index_advisor.note_interaction(DB_PATH, MEMORY_DB_PATH, SQL_ERROR_RESULTS)
+    # Old sql_result payloads are compressed or truncated in the background (see history_store)
+    history_store.note_interaction(MEMORY_DB_PATH)
+
 # --- Updated Main Agent Function ---
 def agent_response(user_query: str) -> str:
     """
     Processes the user's query with the updated flow:
     1. Retrieve schema and compute hash.
-    2. Get cached schema summary.
-    3. Generate SQL query.
-    4. Validate and execute SQL if applicable.
+    2. Assemble the schema summary from cached summaries of the relevant tables.
+    3. Generate SQL query and check it against the schema, repairing it locally or with
+       one LLM retry (skipped when the question -> SQL cache hits).
+    4. Validate and execute SQL if applicable (skipped, with step 5, when the result cache hits).
     5. Generate final answer.
     6. Log interaction.
     """
-    # Step 1: Retrieve current schema.
-    full_schema = get_schema()
-    # Step 2: Retrieve cached schema summary.
-    schema_summary = get_cached_schema_summary(full_schema)
-    # Step 3: Generate SQL query.
-    sql_query = generate_sql_query(user_query, schema_summary)
-    # Step 4: Validate and execute SQL.
-    if sql_query.upper() == "NO_SQL":
-        sql_result = "No relevant data found."
-    else:
-        if not validate_sql_query(sql_query):
-            sql_result = "Invalid SQL query detected."
+    with tracing.trace_request("agent"):
+        # Step 1: Retrieve current schema (cached until PRAGMA schema_version changes).
+        snapshot, sql_query = lookup_sql(user_query)
+        sql_cached = sql_query is not None
+        if not sql_cached:
+            # Step 2: Assemble the schema summary for the tables relevant to the question.
+            schema_summary = build_schema_summary(user_query, snapshot)
+            # Step 3: Generate SQL query, then check and repair it before it runs.
+            sql_query = generate_sql_query(user_query, schema_summary)
+            sql_query = repair_sql_query(user_query, schema_summary, snapshot, sql_query)
+        # Step 4: Validate and execute SQL.
+        version, cached, sql_result = run_sql(user_query, sql_query)
+        # Step 5: Generate final answer.
+        if cached:
+            final_answer = cached[1]
         else:
-            sql_result = execute_sql(sql_query)
-    # Step 5: Generate final answer.
-    generated_final = final_answer_chain.invoke({"question": user_query, "result": sql_result})
-    final_answer = extract_text(generated_final)
-    # Step 6: Log the interaction.
-    log_memory(user_query, sql_query, sql_result, final_answer)
-    return final_answer
+            with tracing.stage("agent", "final_answer"):
+                generated_final = final_answer_chain.invoke({"question": user_query, "result": sql_result})
+            tracing.count("agent", "llm_calls")
+            tracing.record_tokens("agent", "final_answer", generated_final)
+            final_answer = extract_text(generated_final)
+        # Step 6: Log the interaction.
+        record_interaction(user_query, snapshot, sql_query, sql_cached, version, sql_result, final_answer)
+        return final_answer
+
+# --- Async Agent ---
+DB_WORKERS = 8  # Threads available for SQLite work (and schema summaries) in the async agent
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="agent-db")
+
+async def run_db(func, *args):
+    """
+    Runs blocking SQLite work on the bounded database thread pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, func, *args)
+
+async def arepair_sql_query(user_query: str, schema_summary: str, snapshot, sql_query: str) -> str:
+    """
+    Async variant of repair_sql_query; the checks run on the database thread pool.
+    """
+    if not needs_check(sql_query):
+        return sql_query
+    sql_query, error, fixes = await run_db(check_sql, sql_query, snapshot)
+    retries = 0
+    while error and retries < sql_repair.SQL_RETRIES:
+        retries += 1
+        sql_query = await aretry_sql_query(user_query, schema_summary, sql_query, error)
+        if not needs_check(sql_query):
+            break
+        sql_query, error, more = await run_db(check_sql, sql_query, snapshot)
+        fixes += more
+    count_sql_outcome(sql_query, error, fixes, retries)
+    return sql_query
+
+async def agent_response_async(user_query: str) -> str:
+    """
+    Same flow as agent_response, but the LLM calls use ainvoke and SQLite work runs
+    on the database thread pool, so one event loop can serve many questions at once.
+    """
+    with tracing.trace_request("agent"):
+        snapshot, sql_query = await run_db(lookup_sql, user_query)
+        sql_cached = sql_query is not None
+        if not sql_cached:
+            schema_summary = await run_db(build_schema_summary, user_query, snapshot)
+            sql_query = await agenerate_sql_query(user_query, schema_summary)
+            sql_query = await arepair_sql_query(user_query, schema_summary, snapshot, sql_query)
+        version, cached, sql_result = await run_db(run_sql, user_query, sql_query)
+        if cached:
+            final_answer = cached[1]
+        else:
+            with tracing.stage("agent", "final_answer"):
+                generated_final = await final_answer_chain.ainvoke({"question": user_query, "result": sql_result})
+            tracing.count("agent", "llm_calls")
+            tracing.record_tokens("agent", "final_answer", generated_final)
+            final_answer = extract_text(generated_final)
+        await run_db(record_interaction, user_query, snapshot, sql_query, sql_cached, version, sql_result, final_answer)
+        return final_answer
+
+async def agent_response_stream(user_query: str):
+    """
+    Streaming variant of agent_response_async. Yields (event, data) pairs:
+    ("status", "sql_generated"), ("status", "query_executed"), then ("token", text)
+    for each piece of the final answer as the LLM produces it. The interaction is
+    logged with the full answer once the stream completes.
+    """
+    with tracing.trace_request("agent"):
+        snapshot, sql_query = await run_db(lookup_sql, user_query)
+        sql_cached = sql_query is not None
+        if not sql_cached:
+            schema_summary = await run_db(build_schema_summary, user_query, snapshot)
+            sql_query = await agenerate_sql_query(user_query, schema_summary)
+            sql_query = await arepair_sql_query(user_query, schema_summary, snapshot, sql_query)
+        yield "status", "sql_generated"
+        version, cached, sql_result = await run_db(run_sql, user_query, sql_query)
+        yield "status", "query_executed"
+        if cached:
+            final_answer = cached[1]
+            yield "token", final_answer
+        else:
+            pieces = []
+            tracing.count("agent", "llm_calls")
+            with tracing.stage("agent", "final_answer"):
+                async for chunk in final_answer_chain.astream({"question": user_query, "result": sql_result}):
+                    # Usage, when the model reports it while streaming, comes with the last chunk
+                    tracing.record_tokens("agent", "final_answer", chunk)
+                    # Chunks keep their surrounding whitespace; only the joined answer is stripped
+                    text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                    if text:
+                        pieces.append(text)
+                        yield "token", text
+            final_answer = "".join(pieces).strip()
+        await run_db(record_interaction, user_query, snapshot, sql_query, sql_cached, version, sql_result, final_answer)
 
 # --- Example Usage ---
 if __name__ == "__main__":
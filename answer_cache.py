@@ -0,0 +1,216 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from difflib import SequenceMatcher
+from db_pool import get_pool
+
+# --- Configuration ---
+SQL_CACHE_SIZE = 1000          # question -> SQL entries kept in process
+SQL_CACHE_TTL = 24 * 3600      # Seconds a generated SQL query stays valid (also the memory.db retention)
+RESULT_CACHE_SIZE = 500        # (question, SQL, data version) -> answer entries kept in process
+RESULT_CACHE_TTL = 3600        # Seconds a cached answer stays valid even if the data hasn't changed
+FUZZY_MATCHING = False         # Also reuse SQL for near-duplicate questions (typos), see fuzzy_equal
+FUZZY_TOKEN_RATIO = 0.8        # Minimum per-word similarity for a fuzzy match
+
+# Words that don't change what is being asked
+STOPWORDS = {"a", "an", "the", "is", "are", "was", "what", "whats", "please", "show", "me", "tell",
+             "give", "can", "could", "you", "i", "want", "to", "know", "list"}
+
+# --- Question Normalization ---
+def normalize_question(question: str) -> str:
+    """
+    Lowercases a question and drops punctuation and filler words, keeping word order
+    ("flights from London to Paris" must not match "... Paris to London"). Words are
+    Unicode-aware, so "máximo" stays one word; scripts written without spaces (Chinese,
+    Japanese) come out as whole phrases, which only ever match exactly.
+    """
+    words = re.findall(r"\w+", question.lower())
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+def fuzzy_equal(left: str, right: str) -> bool:
+    """
+    Checks whether two normalized questions differ only by typos: same number of
+    words, and each word is close to the word in the same position. Numbers and short
+    words must match exactly, so "salary in us" never matches "salary in uk".
+    """
+    left_words, right_words = left.split(), right.split()
+    if len(left_words) != len(right_words):
+        return False
+    for a, b in zip(left_words, right_words):
+        if a == b:
+            continue
+        if len(a) <= 3 or len(b) <= 3 or any(c.isdigit() for c in a + b):
+            return False
+        if SequenceMatcher(None, a, b).ratio() < FUZZY_TOKEN_RATIO:
+            return False
+    return True
+
+# --- LRU/TTL Cache ---
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry time to live and hit/miss counters.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if count:
+                self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        """Returns a list of the live (key, value) pairs, most recently used last."""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, entry[1]) for key, entry in self._entries.items() if entry[0] > now]
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+# --- Answer Cache ---
+class AnswerCache:
+    """
+    Two-level cache in front of the agent pipeline:
+
+    - question -> SQL, keyed by the normalized question and the schema hash, so a
+      repeated question skips SQL generation. Entries are also persisted in the
+      sql_cache table of memory.db, so they survive restarts.
+    - (question, SQL, data version) -> (SQL result, final answer), so a repeated question on
+      unchanged data skips execution and the final-answer LLM call too. Data versions
+      are only comparable within one process, so this level is not persisted.
+    """
+    def __init__(self, memory_db_path):
+        self.memory_db_path = memory_db_path
+        self.sql = LRUCache(SQL_CACHE_SIZE, SQL_CACHE_TTL)
+        self.results = LRUCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+    @staticmethod
+    def _question_key(normalized, schema_hash):
+        return hashlib.sha256(f"{schema_hash}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def get_sql(self, question, schema_hash):
+        """
+        Returns the cached SQL for a question on the current schema, or None.
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        key = self._question_key(normalized, schema_hash)
+        entry = self.sql.get(key, count=False)
+        if entry is None:
+            entry = self._load_sql(key)
+        if entry is None and FUZZY_MATCHING:
+            entry = next(
+                (value for _, value in reversed(self.sql.items())
+                 if value[0] == schema_hash and fuzzy_equal(normalized, value[1])),
+                None,
+            )
+        self.sql.record(entry is not None)
+        if entry is None:
+            return None
+        self.sql.put(key, entry)
+        return entry[2]
+
+    def put_sql(self, question, schema_hash, sql_query):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = self._question_key(normalized, schema_hash)
+        self.sql.put(key, (schema_hash, normalized, sql_query))
+        now = time.time()
+        with get_pool(self.memory_db_path).connection() as conn:
+            conn.execute("""
+                INSERT INTO sql_cache (question_key, schema_hash, question, sql_query, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(question_key) DO UPDATE SET
+                    sql_query = excluded.sql_query,
+                    created_at = excluded.created_at
+            """, (key, schema_hash, normalized, sql_query, now))
+            # Apply the same TTL and size limit to the persisted copy
+            conn.execute("DELETE FROM sql_cache WHERE created_at < ?", (now - SQL_CACHE_TTL,))
+            conn.execute("""
+                DELETE FROM sql_cache WHERE question_key NOT IN (
+                    SELECT question_key FROM sql_cache ORDER BY created_at DESC LIMIT ?
+                )
+            """, (SQL_CACHE_SIZE,))
+            conn.commit()
+
+    def _load_sql(self, key):
+        with get_pool(self.memory_db_path).connection() as conn:
+            row = conn.execute(
+                "SELECT schema_hash, question, sql_query FROM sql_cache WHERE question_key = ? AND created_at >= ?",
+                (key, time.time() - SQL_CACHE_TTL),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def get_result(self, question, sql_query, data_version):
+        """
+        Returns the cached (sql_result, final_answer) for the same question and query on
+        unchanged data, or None. The answer is phrased for one question, so questions that
+        happen to share a query ("how many ..." vs "are there more than ...") never share it.
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        return self.results.get((normalized, sql_query.strip(), data_version))
+
+    def put_result(self, question, sql_query, data_version, sql_result, final_answer):
+        normalized = normalize_question(question)
+        if normalized:
+            self.results.put((normalized, sql_query.strip(), data_version), (sql_result, final_answer))
+
+    def clear(self):
+        """
+        Empties both levels, including the persisted question -> SQL entries.
+        """
+        self.sql.clear()
+        self.results.clear()
+        with get_pool(self.memory_db_path).connection() as conn:
+            conn.execute("DELETE FROM sql_cache")
+            conn.commit()
+
+    def stats(self):
+        return {"sql": self.sql.stats(), "results": self.results.stats(), "as_of": datetime.now().isoformat()}
@@ -1,9 +1,27 @@
-from ai_agent_response import agent_response
-from flask import Flask, render_template, request, jsonify
-from load_file_from_url import load_file_from_url
-import sqlite3
+from ai_agent_response import (agent_response_async, agent_response_stream, init_databases, answer_cache,
+                               DB_PATH, MEMORY_DB_PATH, SQL_ERROR_RESULTS)
+from background import run_async, iterate_async, submit_job, get_job, job_progress, schedule
+from history_store import history_page, submit_compaction, PAGE_SIZE
+from index_advisor import submit_advisor
+from log_writer import get_log_writer
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import json
+from load_file_from_url import (load_file_from_url, load_files_from_urls, refresh_sources, refresh_due_sources,
+                                SOURCES_DB_PATH)
+import source_registry
+import tracing
+
+MAX_BATCH_URLS = 100  # URLs accepted by one /upload/batch request
+SOURCE_CHECK_INTERVAL = 60  # Seconds between checks for registered URLs due a scheduled refresh
 
 app = Flask(__name__)
+init_databases()  # One-time schema bootstrap for memory.db
+
+@app.before_request
+def start_source_refresh():
+    # Started on the first request, so only the process serving requests (not the
+    # debug reloader's watcher) refreshes registered URLs
+    schedule(refresh_due_sources, SOURCE_CHECK_INTERVAL, name="source-refresh")
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -15,18 +33,20 @@ def index():
             url = request.form.get("documentUrl")
             token = request.form.get("oauthToken")  # Get token if provided
             print(f"URL: {url}, Token: {token}")
+            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+                # Ingest in the background so long uploads don't hold a request worker;
+                # the page polls /jobs/<job_id> for the result.
+                job_id = submit_job(load_file_from_url, url, token)
+                return jsonify({"job_id": job_id, "status": "queued"}), 202
             if token:
                 result = load_file_from_url(url, token)  # Pass token if present
             else:
                 result = load_file_from_url(url)  # No token, use original call
-            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-                return jsonify({"result": result})
-            else:
-                return render_template("index.html", result=result)
+            return render_template("index.html", result=result)
         # Handle chat messages
         elif "query" in request.form:
             query = request.form.get("query")
-            result = agent_response(query)
+            result = run_async(agent_response_async(query))
             if request.headers.get("X-Requested-With") == "XMLHttpRequest":
                 return jsonify({"result": result})
             else:
@@ -34,17 +54,121 @@ def index():
         else:
             return render_template("index.html")
         
+def load_batch(sources):
+    # Runs as a background job; per-URL statuses show up as the job's progress
+    return load_files_from_urls(sources, on_update=job_progress())
+
+@app.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """
+    Loads several URLs in one background job. Accepts JSON {"sources": [{"url", "token"}, ...]}
+    or a form with one URL per line in "documentUrls" and an optional shared "oauthToken".
+    """
+    payload = request.get_json(silent=True)
+    if payload is not None:
+        sources = [{"url": source} if isinstance(source, str) else source for source in payload.get("sources", [])]
+    else:
+        token = request.form.get("oauthToken") or None
+        sources = [{"url": line.strip(), "token": token}
+                   for line in request.form.get("documentUrls", "").splitlines() if line.strip()]
+    if not sources or not all(isinstance(source, dict) and source.get("url") for source in sources):
+        return jsonify({"error": "Provide at least one URL"}), 400
+    if len(sources) > MAX_BATCH_URLS:
+        return jsonify({"error": f"At most {MAX_BATCH_URLS} URLs per batch"}), 400
+    job_id = submit_job(load_batch, sources)
+    return jsonify({"job_id": job_id, "status": "queued", "urls": len(sources)}), 202
+
+@app.route("/sources", methods=["GET"])
+def sources():
+    return jsonify([source._asdict() for source in source_registry.list_sources(SOURCES_DB_PATH)])
+
+def refresh_all(force):
+    return refresh_sources(force=force, on_update=job_progress())
+
+@app.route("/sources/refresh", methods=["POST"])
+def refresh():
+    """
+    Re-checks one URL (JSON {"url", "mode", "key_column", "refresh_interval", "force", "token"},
+    which also updates its registered settings) or, without "url", every registered URL.
+    Runs as a background job; unchanged URLs are skipped.
+    """
+    payload = request.get_json(silent=True) or {}
+    mode = payload.get("mode")
+    if mode is not None and mode not in source_registry.REFRESH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(source_registry.REFRESH_MODES)}"}), 400
+    if payload.get("url"):
+        job_id = submit_job(load_batch, [payload])
+    else:
+        job_id = submit_job(refresh_all, bool(payload.get("force")))
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Server-sent events for one chat message: progress events while the SQL is
+    generated and executed, then the final answer token by token.
+    """
+    query = request.form.get("query", "")
+
+    def events():
+        try:
+            for event, data in iterate_async(agent_response_stream(query)):
+                yield f"data: {json.dumps({'type': event, 'data': data})}\n\n"
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        except Exception as e:
+            print(f"Streaming error: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'data': 'Error retrieving agent response.'})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def read_history():
+    # ?before=<cursor from the previous page>&q=<search text>&limit=<page size>
+    before, search = request.args.get("before"), request.args.get("q", "")
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return history_page(MEMORY_DB_PATH, before, search, limit), search
+
 @app.route("/history", methods=["GET"])
 def history():
-    try:
-        conn = sqlite3.connect("memory.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_query, final_answer, timestamp FROM memory_logs ORDER BY timestamp ASC")
-        interactions = cursor.fetchall()
-        conn.close()
-    except sqlite3.OperationalError:
-        interactions = []  # If database or table doesn’t exist, return empty list
-    return render_template("history.html", interactions=interactions)
+    (interactions, next_cursor), search = read_history()
+    return render_template("history.html", interactions=interactions, next_cursor=next_cursor, search=search)
+
+@app.route("/history/entries", methods=["GET"])
+def history_entries():
+    (interactions, next_cursor), _ = read_history()
+    return jsonify({"interactions": interactions, "next": next_cursor})
+
+@app.route("/history/compact", methods=["POST"])
+def compact_history():
+    # Runs in the background; the job result counts the compacted rows and freed pages
+    return jsonify({"job_id": submit_compaction(MEMORY_DB_PATH), "status": "queued"}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route("/indexes/advise", methods=["POST"])
+def advise_indexes():
+    # Runs in the background; the report (created/dropped indexes, replay timings) is the job result
+    job_id = submit_advisor(DB_PATH, MEMORY_DB_PATH, SQL_ERROR_RESULTS)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(answer_cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Per-stage latency histograms and LLM token counters of the agent and ingest pipelines
+    return Response(tracing.render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/logs/stats", methods=["GET"])
+def log_stats():
+    # Queue depth, batches written and the back-pressure ("blocked") and "dropped" counters
+    return jsonify(get_log_writer(MEMORY_DB_PATH).stats())
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)
\ No newline at end of file
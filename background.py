@@ -0,0 +1,178 @@
+import asyncio
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration ---
+REQUEST_TIMEOUT = 120     # Seconds a request waits for its coroutine before giving up
+INGEST_WORKERS = 2        # Concurrent background ingestion jobs
+MAX_FINISHED_JOBS = 200   # Finished jobs kept for status lookups
+
+# --- Shared Event Loop ---
+# One event loop in a daemon thread runs every async agent call, so the LLM clients'
+# connections are reused across requests and a waiting request costs no extra threads.
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    """
+    Returns the shared event loop, starting its thread on first use.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def run_async(coro, timeout=REQUEST_TIMEOUT):
+    """
+    Runs a coroutine on the shared event loop and waits for its result.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+_END = object()
+
+def iterate_async(agen, timeout=REQUEST_TIMEOUT):
+    """
+    Consumes an async generator on the shared event loop and yields its items from
+    the calling thread, e.g. for a streaming Flask response. Closing the returned
+    generator (such as on client disconnect) cancels the async side.
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(_END)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            item = items.get(timeout=timeout)
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
+
+# --- Background Jobs ---
+_jobs = OrderedDict()     # job id -> status dict
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_current = threading.local()  # The job running on this thread, for job_progress
+
+def _run_job(job_id, func, args, kwargs):
+    with _jobs_lock:
+        _jobs[job_id].update(status="running", started_at=time.time())
+    _current.job_id = job_id
+    try:
+        result, status = func(*args, **kwargs), "done"
+    except Exception as e:
+        result, status = f"Error: {e}", "failed"
+    finally:
+        _current.job_id = None
+    with _jobs_lock:
+        _jobs[job_id].update(status=status, result=result, finished_at=time.time())
+
+def submit_job(func, *args, **kwargs) -> str:
+    """
+    Queues func(*args, **kwargs) on the ingestion pool and returns a job id for get_job.
+    """
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _jobs[job_id] = {"id": job_id, "status": "queued", "result": None, "progress": None,
+                         "submitted_at": time.time(), "started_at": None, "finished_at": None}
+        # Forget the oldest finished jobs
+        finished = [key for key, job in _jobs.items() if job["finished_at"] is not None]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[key]
+    _executor.submit(_run_job, job_id, func, args, kwargs)
+    return job_id
+
+def job_progress():
+    """
+    Returns a callable that stores its argument as the "progress" of the job running
+    on the calling thread; it may then be called from any thread. Outside a job the
+    callable does nothing.
+    """
+    job_id = getattr(_current, "job_id", None)
+
+    def report(progress):
+        with _jobs_lock:
+            if job_id in _jobs:
+                _jobs[job_id]["progress"] = progress
+
+    return report
+
+def get_job(job_id):
+    """
+    Returns a copy of a job's status dict, or None for unknown ids.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+class CountedJob:
+    """
+    A background job triggered every `every` calls of note(), or on demand with
+    submit(). A run is skipped while the previous one is still queued or running.
+    """
+    def __init__(self, func):
+        self.func = func
+        self._count = 0
+        self._job_id = None
+        self._lock = threading.Lock()
+
+    def submit(self, *args) -> str:
+        """
+        Queues func(*args) unless a run is still queued or running. Returns the job id.
+        """
+        with self._lock:
+            job = get_job(self._job_id) if self._job_id else None
+            if job is None or job["finished_at"] is not None:
+                self._job_id = submit_job(self.func, *args)
+            return self._job_id
+
+    def note(self, every, *args):
+        """
+        Counts one event and submits func(*args) on every `every`-th.
+        """
+        with self._lock:
+            self._count += 1
+            due = self._count % every == 0
+        if due:
+            self.submit(*args)
+
+# --- Periodic Tasks ---
+_scheduled = {}           # name -> thread
+_scheduled_lock = threading.Lock()
+
+def schedule(func, interval, name):
+    """
+    Calls func() every `interval` seconds on a daemon thread. A name that is already
+    scheduled is not started twice. Errors are printed and the next run goes ahead.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                func()
+            except Exception as e:
+                print(f"Scheduled task {name} failed: {e}")
+
+    with _scheduled_lock:
+        if name not in _scheduled:
+            _scheduled[name] = threading.Thread(target=run, name=name, daemon=True)
+            _scheduled[name].start()
+        return _scheduled[name]
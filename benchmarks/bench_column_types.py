@@ -0,0 +1,137 @@
+"""
+Measures what typed column storage at ingest buys: database size and the speed of
+typical aggregate queries, loading the same synthetic JSON API export three ways.
+
+    text        infer_types=False (the previous behaviour: every string column is TEXT)
+    typed       infer_types=True
+    dictionary  infer_types=True with DICTIONARY_ENCODING for low-cardinality strings
+
+The export has numbers, booleans and US-style dates as strings, as many APIs send
+them. Each query is written the way it has to be for that storage (CAST, string
+slicing or a lookup JOIN) and timed as the best of --runs.
+
+Usage:
+    python benchmarks/bench_column_types.py --rows 300000
+"""
+import argparse
+import http.server
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import load_file_from_url as loader
+
+DATE_TEXT = "substr({d}, 7, 4) || '-' || substr({d}, 1, 2) || '-' || substr({d}, 4, 2)"
+
+QUERIES = {
+    "avg amount by region": {
+        "text": "SELECT region, AVG(CAST(amount AS REAL)) FROM {t} GROUP BY region",
+        "typed": "SELECT region, AVG(amount) FROM {t} GROUP BY region",
+        "dictionary": "SELECT v.value, AVG(amount) FROM {t} JOIN {t_region} v ON v.id = region GROUP BY v.value",
+    },
+    "orders per year": {
+        "text": "SELECT substr(order_date, 7, 4) AS y, COUNT(*) FROM {t} GROUP BY y",
+        "typed": "SELECT substr(order_date, 1, 4) AS y, COUNT(*) FROM {t} GROUP BY y",
+        "dictionary": "SELECT substr(order_date, 1, 4) AS y, COUNT(*) FROM {t} GROUP BY y",
+    },
+    "paid orders in H1 2022": {
+        "text": f"SELECT COUNT(*), SUM(CAST(quantity AS INTEGER)) FROM {{t}} WHERE LOWER(paid) = 'true' "
+                f"AND {DATE_TEXT.format(d='order_date')} BETWEEN '2022-01-01' AND '2022-06-30'",
+        "typed": "SELECT COUNT(*), SUM(quantity) FROM {t} WHERE paid = 1 AND order_date BETWEEN '2022-01-01' AND '2022-06-30'",
+        "dictionary": "SELECT COUNT(*), SUM(quantity) FROM {t} WHERE paid = 1 AND order_date BETWEEN '2022-01-01' AND '2022-06-30'",
+    },
+    "top customers": {
+        "text": "SELECT customer_id, SUM(CAST(amount AS REAL)) AS s FROM {t} GROUP BY customer_id ORDER BY s DESC LIMIT 10",
+        "typed": "SELECT customer_id, SUM(amount) AS s FROM {t} GROUP BY customer_id ORDER BY s DESC LIMIT 10",
+        "dictionary": "SELECT customer_id, SUM(amount) AS s FROM {t} GROUP BY customer_id ORDER BY s DESC LIMIT 10",
+    },
+}
+
+
+def write_export(path, rows, seed=0):
+    rng = random.Random(seed)
+    regions = ["North America", "Western Europe", "Eastern Europe", "South East Asia", "Latin America", "Middle East"]
+    statuses = ["delivered", "shipped", "processing", "cancelled", "returned"]
+    with open(path, "w") as f:
+        f.write("[")
+        for i in range(rows):
+            record = {
+                "order_id": str(100000 + i),
+                "customer_id": str(rng.randint(1, 20000)),
+                "order_date": f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2019, 2024)}",
+                "amount": f"{rng.uniform(5, 2000):.2f}",
+                "quantity": str(rng.randint(1, 20)),
+                "paid": rng.choice(["true", "false"]),
+                "region": rng.choice(regions),
+                "status": rng.choice(statuses),
+            }
+            f.write(("," if i else "") + json.dumps(record))
+        f.write("]")
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    handler = partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def best_time(conn, sql, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_types_")
+    os.chdir(workdir)  # The loader's other relative database paths (memory.db) resolve here
+    write_export(os.path.join(workdir, "orders.json"), args.rows)
+    server = serve(workdir)
+    url = f"http://127.0.0.1:{server.server_address[1]}/orders.json"
+
+    results = {}
+    for mode in ("text", "typed", "dictionary"):
+        loader.DB_PATH = os.path.join(workdir, f"{mode}.db")
+        loader.DICTIONARY_ENCODING = mode == "dictionary"
+        print(loader.load_file_from_url(url, infer_types=mode != "text"))
+        db_pool.close_all()
+        conn = sqlite3.connect(loader.DB_PATH)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        table = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE '%_values'").fetchone()[0]
+        names = {"t": f'"{table}"', "t_region": f'"{table}_region_values"'}
+        timings = {name: best_time(conn, sql[mode].format(**names), args.runs) for name, sql in QUERIES.items()}
+        conn.close()
+        results[mode] = (os.path.getsize(loader.DB_PATH), timings)
+
+    print(f"\n{args.rows} rows")
+    print(f"{'':>24}" + "".join(f"{mode:>12}" for mode in results))
+    print(f"{'file size (MB)':>24}" + "".join(f"{size / 1e6:>12.1f}" for size, _ in results.values()))
+    for name in QUERIES:
+        print(f"{name + ' (ms)':>24}" + "".join(f"{timings[name] * 1000:>12.1f}" for _, timings in results.values()))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmarks preprocess_dataframe against the previous per-cell implementation
+on synthetic wide frames shaped like flattened json_normalize output.
+
+Usage:
+    python benchmarks/bench_preprocess.py --rows 200000 --cols 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_file_from_url import preprocess_dataframe
+
+
+def legacy_preprocess_dataframe(df):
+    """
+    The per-column, per-cell implementation preprocess_dataframe replaced.
+    """
+    for col in df.columns:
+        if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
+            df[col] = df[col].apply(str)
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+        df[col] = df[col].where(pd.notnull(df[col]), None)
+    return df
+
+
+def make_wide_frame(rows, cols, nested_ratio=0.05, seed=0):
+    """
+    Builds a frame with a mix of int, float, text, datetime and nested columns.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(cols):
+        kind = i % 4
+        if i < cols * nested_ratio:
+            data[f"nested.{i}"] = pd.Series([[j, {"k": j}] if j % 3 else None for j in range(rows)], dtype=object)
+        elif kind == 0:
+            data[f"int.{i}"] = rng.integers(0, 1000, rows)
+        elif kind == 1:
+            values = rng.random(rows)
+            values[::7] = np.nan
+            data[f"float.{i}"] = values
+        elif kind == 2:
+            text = pd.Series(rng.choice(["alpha", "beta", "gamma", None], rows), dtype=object)
+            data[f"text.{i}"] = text
+        else:
+            data[f"date.{i}"] = pd.to_datetime(rng.integers(1.5e9, 1.7e9, rows), unit="s")
+    return pd.DataFrame(data)
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cols", type=int, nargs="+", default=[50, 200])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'cols':>5} {'before (s)':>11} {'after (s)':>10} {'speedup':>8}")
+    for cols in args.cols:
+        df = make_wide_frame(args.rows, cols)
+        before = timed(legacy_preprocess_dataframe, df.copy())
+        after = timed(preprocess_dataframe, df.copy())
+        print(f"{args.rows:>8} {cols:>5} {before:>11.2f} {after:>10.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline benchmark suite: URL ingestion and agent latency/throughput, with no
+credentials or network access, saved as JSON for comparison across runs.
+
+Ingestion: synthetic CSV and JSON datasets of each --rows x --width (integer,
+float, text and date columns) are served from a local HTTP server and loaded with
+load_file_from_url, each in a fresh process so its peak RSS (ru_maxrss) is its own.
+Reported: rows/sec, seconds, peak RSS and the RSS growth over the idle process.
+
+Agent: for each --tables count, a database of that many tables is queried through
+agent_response_async with the deterministic llm_backends.FakeChatModel (canned SQL
+per question, --llm-latency seconds per call) at each --concurrency level. Every
+question is unique, so the answer caches don't short-circuit the pipeline.
+Reported: requests/sec and p50/p95/max latency.
+
+Usage:
+    python benchmarks/bench_suite.py --rows 100000 --width 10 50 --concurrency 1 8 32 --tables 10 100
+    python benchmarks/bench_suite.py --output new.json --compare old.json
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CITIES = ["london", "paris", "berlin", "madrid", "tokyo", "delhi", "austin", "lima", "oslo", "rome"]
+
+
+# --- Datasets ---
+def column_names(width):
+    kinds = ["int", "float", "text", "date"]
+    return [(f"{kinds[i % len(kinds)]}_{i}", kinds[i % len(kinds)]) for i in range(width)]
+
+
+def value(kind, rng):
+    if kind == "int":
+        return rng.randint(0, 1_000_000)
+    if kind == "float":
+        return round(rng.uniform(0, 10_000), 2)
+    if kind == "text":
+        return rng.choice(CITIES)
+    return f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def write_dataset(directory, fmt, rows, width, seed=0):
+    """
+    Writes rows x width synthetic records as CSV or a JSON array. Returns the file name.
+    """
+    rng = random.Random(seed)
+    columns = column_names(width)
+    name = f"data_{rows}x{width}.{fmt}"
+    with open(os.path.join(directory, name), "w") as f:
+        if fmt == "csv":
+            f.write(",".join(col for col, _ in columns) + "\n")
+            for _ in range(rows):
+                f.write(",".join(str(value(kind, rng)) for _, kind in columns) + "\n")
+        else:
+            f.write("[")
+            for i in range(rows):
+                record = {col: value(kind, rng) for col, kind in columns}
+                f.write(("," if i else "") + json.dumps(record))
+            f.write("]")
+    return name
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    extensions_map = {".csv": "text/csv", ".json": "application/json"}
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- Ingestion ---
+def ingest_worker(url, db_path, results):
+    """
+    Runs in a fresh process: loads one URL and reports throughput and peak RSS.
+    """
+    import load_file_from_url as loader
+    loader.DB_PATH = db_path
+    loader.SOURCES_DB_PATH = db_path + ".sources"
+    idle_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    start = time.perf_counter()
+    message = loader.load_file_from_url(url)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({"message": message, "seconds": seconds, "idle_rss_mb": idle_kb / 1024, "peak_rss_mb": peak_kb / 1024})
+
+
+def bench_ingest(workdir, rows, widths, formats):
+    server = serve(workdir)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for width in widths:
+            for fmt in formats:
+                name = write_dataset(workdir, fmt, rows, width)
+                queue = context.Queue()
+                db_path = os.path.join(workdir, f"ingest_{fmt}_{width}.db")
+                process = context.Process(target=ingest_worker,
+                                          args=(f"http://127.0.0.1:{server.server_address[1]}/{name}", db_path, queue))
+                process.start()
+                run = queue.get()
+                process.join()
+                if not run["message"].startswith("Success"):
+                    raise RuntimeError(run["message"])
+                results.append({
+                    "format": fmt, "rows": rows, "width": width,
+                    "file_mb": round(os.path.getsize(os.path.join(workdir, name)) / 1e6, 2),
+                    "seconds": round(run["seconds"], 3),
+                    "rows_per_sec": round(rows / run["seconds"]),
+                    "peak_rss_mb": round(run["peak_rss_mb"], 1),
+                    "rss_growth_mb": round(run["peak_rss_mb"] - run["idle_rss_mb"], 1),
+                })
+                print(f"ingest {fmt:>4} {rows}x{width}: {results[-1]['rows_per_sec']:>9,} rows/sec, "
+                      f"peak RSS {results[-1]['peak_rss_mb']} MB (+{results[-1]['rss_growth_mb']} MB)")
+    finally:
+        server.shutdown()
+    return results
+
+
+# --- Agent ---
+def build_database(path, tables, rows):
+    conn = sqlite3.connect(path)
+    for t in range(tables):
+        conn.execute(f'CREATE TABLE "sales_{t:04d}" (id INTEGER, city TEXT, amount REAL, quantity INTEGER)')
+        conn.executemany(f'INSERT INTO "sales_{t:04d}" VALUES (?, ?, ?, ?)',
+                         [(i, CITIES[i % len(CITIES)], i * 1.5, i % 20) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+async def fire(agent, questions, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(question):
+        async with gate:
+            start = time.perf_counter()
+            await agent.agent_response_async(question)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(question) for question in questions))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def bench_agent(workdir, table_counts, levels, requests, table_rows, llm_latency):
+    import ai_agent_response as agent
+    import db_pool
+    import schema_catalog
+    from background import run_async
+    from llm_backends import FakeChatModel
+
+    fake = FakeChatModel(latency=llm_latency)
+    agent.set_llms(fake)
+    results = []
+    for tables in table_counts:
+        # The agent's default database path (relative to workdir) is rebuilt for each table count
+        db_pool.close_all()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(agent.DB_PATH + suffix):
+                os.remove(agent.DB_PATH + suffix)
+        build_database(agent.DB_PATH, tables, table_rows)
+        schema_catalog.invalidate()
+        agent.init_databases()
+        agent.answer_cache.clear()
+        rng = random.Random(tables)
+        for concurrency in levels:
+            questions = []
+            for i in range(requests):
+                question = f"total amount in {rng.choice(CITIES)} for run {concurrency} question {i}"
+                table = f"sales_{rng.randrange(tables):04d}"
+                fake.add_sql(question, f"SELECT city, SUM(amount), COUNT(*), '{concurrency}-{i}' FROM \"{table}\" "
+                                       f"WHERE city = '{question.split()[3]}' GROUP BY city")
+                questions.append(question)
+            elapsed, latencies = run_async(fire(agent, questions, concurrency), timeout=3600)
+            results.append({
+                "tables": tables, "concurrency": concurrency, "requests": requests,
+                "requests_per_sec": round(requests / elapsed, 2),
+                "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2),
+                "max_ms": round(latencies[-1] * 1000, 2),
+            })
+            print(f"agent {tables:>5} tables, concurrency {concurrency:>3}: {results[-1]['requests_per_sec']:>8} req/s, "
+                  f"p50 {results[-1]['p50_ms']} ms, p95 {results[-1]['p95_ms']} ms")
+    return results
+
+
+# --- Comparison ---
+def compare(old, new):
+    """
+    Prints each metric of the new run next to the matching entry of an earlier run.
+    """
+    metrics = {"ingest": (("format", "rows", "width"), ("rows_per_sec", "peak_rss_mb")),
+               "agent": (("tables", "concurrency"), ("requests_per_sec", "p50_ms", "p95_ms"))}
+    for section, (keys, fields) in metrics.items():
+        previous = {tuple(entry[k] for k in keys): entry for entry in old.get(section, [])}
+        for entry in new.get(section, []):
+            key = tuple(entry[k] for k in keys)
+            if key not in previous:
+                continue
+            changes = ", ".join(f"{field} {previous[key][field]} -> {entry[field]} "
+                                f"({(entry[field] / previous[key][field] - 1) * 100:+.1f}%)"
+                                for field in fields if previous[key].get(field))
+            print(f"{section} {dict(zip(keys, key))}: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Rows per ingestion dataset")
+    parser.add_argument("--width", type=int, nargs="+", default=[10, 50], help="Columns per ingestion dataset")
+    parser.add_argument("--formats", nargs="+", default=["csv", "json"], choices=["csv", "json"])
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 100], help="Table counts for the agent runs")
+    parser.add_argument("--table-rows", type=int, default=1000, help="Rows per table in the agent runs")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Agent requests per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ingest", "agent"])
+    parser.add_argument("--output", default="bench_suite.json")
+    parser.add_argument("--compare", help="An earlier --output file to compare with")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.chdir(workdir)  # The modules' relative database paths resolve here
+    report = {"meta": {"started_at": datetime.now().isoformat(), "python": platform.python_version(),
+                       "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "args": vars(args)}}
+    if "ingest" not in args.skip:
+        report["ingest"] = bench_ingest(workdir, args.rows, args.width, args.formats)
+    if "agent" not in args.skip:
+        report["agent"] = bench_agent(workdir, args.tables, args.concurrency, args.requests,
+                                      args.table_rows, args.llm_latency)
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if previous:
+        with open(previous) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compares SQL-generation prompt size and end-to-end agent_response latency with and
+without relevance-based table pruning, on a synthetic database of many tables.
+
+The LLM chains are replaced by local stubs whose latency grows with prompt size
+(--ms-per-1k-tokens), so no credentials or network access are needed. Prompt
+tokens are approximated as characters / 4.
+
+Usage:
+    python benchmarks/bench_table_pruning.py --tables 20 100 300
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VOCABULARY = [
+    "employee", "salary", "country", "department", "hire_date", "order", "product", "price", "quantity",
+    "customer", "invoice", "region", "revenue", "supplier", "warehouse", "shipment", "ticket", "priority",
+    "campaign", "clicks", "budget", "patient", "diagnosis", "doctor", "flight", "airport", "delay",
+    "student", "grade", "course", "vehicle", "mileage", "sensor", "temperature", "store", "category",
+]
+CITIES = ["london", "paris", "berlin", "madrid", "tokyo", "delhi", "austin", "lima", "oslo", "rome"]
+
+
+def build_database(path, tables, rows=200, seed=0):
+    """
+    Creates `tables` tables, each over a random handful of vocabulary columns.
+    Returns the column lists so questions can target a specific table.
+    """
+    rng = random.Random(seed)
+    layout = {}
+    conn = sqlite3.connect(path)
+    for i in range(tables):
+        columns = rng.sample(VOCABULARY, 5)
+        name = f"data_{i:04d}"
+        layout[name] = columns
+        conn.execute(f'CREATE TABLE "{name}" ("Id" INTEGER, ' + ", ".join(f'"{c}" TEXT' for c in columns) + ")")
+        conn.executemany(
+            f'INSERT INTO "{name}" VALUES ({", ".join("?" * (len(columns) + 1))})',
+            [(r, *(rng.choice(CITIES) for _ in columns)) for r in range(rows)],
+        )
+    conn.commit()
+    conn.close()
+    return layout
+
+
+def install_stub_llm(agent, ms_per_1k_tokens, prompt_sizes):
+    """
+    Swaps the LLM chains for stubs. SQL generation sleeps in proportion to its prompt.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def table_summary(inputs):
+        return "Columns: " + inputs["table"][inputs["table"].find("(") + 1:-1]
+
+    def generate_sql(inputs):
+        prompt = agent.sql_generation_prompt.format(**inputs)
+        tokens = len(prompt) / 4
+        prompt_sizes.append(tokens)
+        time.sleep(tokens * ms_per_1k_tokens / 1e6)
+        return "NO_SQL"
+
+    agent.table_summary_chain = RunnableLambda(table_summary)
+    agent.sql_generation_chain = RunnableLambda(generate_sql)
+    agent.final_answer_chain = RunnableLambda(lambda inputs: "ok")
+
+
+def run(agent, questions, prune, ms_per_1k_tokens):
+    prompt_sizes = []
+    install_stub_llm(agent, ms_per_1k_tokens, prompt_sizes)
+    original = agent.select_tables
+    if not prune:
+        agent.select_tables = lambda question, snapshot: agent.schema_catalog.user_tables(snapshot)
+    # Every question must reach SQL generation, so the question -> SQL cache is bypassed
+    agent.answer_cache.get_sql = lambda question, schema_hash: None
+    try:
+        agent.agent_response(questions[0])  # Warm the summary cache and table index
+        prompt_sizes.clear()
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            agent.agent_response(question)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        agent.select_tables = original
+        del agent.answer_cache.get_sql
+    return statistics.mean(prompt_sizes), statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, nargs="+", default=[20, 100, 300])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=50.0,
+                        help="Simulated LLM prefill cost per 1k prompt tokens")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pruning_")
+    os.chdir(workdir)  # The agent's relative database paths resolve here
+    import ai_agent_response as agent
+    import db_pool
+    import schema_catalog
+    import table_index
+
+    print(f"{'tables':>6} {'tokens full':>12} {'tokens pruned':>14} {'ms full':>8} {'ms pruned':>10} {'recall':>7}")
+    for count in args.tables:
+        db_pool.close_all()
+        for path in ("mydatabase.db", "memory.db"):
+            if os.path.exists(path):
+                os.remove(path)
+        schema_catalog.invalidate()
+        table_index._indexes.clear()
+        agent._summary_cache.update(schema_hash=None, summaries=None)
+        layout = build_database("mydatabase.db", count)
+        rng = random.Random(count)
+        questions, targets = [], []
+        for _ in range(args.questions):
+            target = rng.choice(list(layout))
+            columns = layout[target]
+            questions.append(f"What is the average {columns[0]} by {columns[1]} in {rng.choice(CITIES)}?")
+            targets.append(target)
+        full_tokens, full_ms = run(agent, questions, False, args.ms_per_1k_tokens)
+        pruned_tokens, pruned_ms = run(agent, questions, True, args.ms_per_1k_tokens)
+        # Share of questions whose intended table survived pruning
+        snapshot = agent.get_schema_snapshot()
+        recall = statistics.mean(t in agent.select_tables(q, snapshot) for q, t in zip(questions, targets))
+        print(f"{count:>6} {full_tokens:>12.0f} {pruned_tokens:>14.0f} {full_ms:>8.1f} {pruned_ms:>10.1f} {recall:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Load test for the chat endpoint against a local stub LLM.
+
+Starts the Flask app on a local port with the LLM chains replaced by stubs that
+take --llm-latency seconds per call, then fires chat requests at increasing
+concurrency levels and reports throughput and latency percentiles.
+
+Modes:
+    async  the app as shipped (ainvoke on a shared event loop, SQLite on a thread pool)
+    sync   the previous behaviour for comparison: the blocking agent_response on a
+           single-threaded server, i.e. one request per worker at a time
+
+Usage:
+    python benchmarks/load_test_concurrency.py --mode async sync --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def install_stub_llm(agent, latency):
+    """
+    Replaces the chains with stubs that sleep for `latency` seconds (sync and async).
+    Every question gets unique SQL so the answer cache never short-circuits a request.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def stub(respond):
+        def func(inputs):
+            time.sleep(latency)
+            return respond(inputs)
+
+        async def afunc(inputs):
+            await asyncio.sleep(latency)
+            return respond(inputs)
+
+        return RunnableLambda(func, afunc=afunc)
+
+    agent.table_summary_chain = stub(lambda inputs: "Employee salaries by country.")
+    agent.sql_generation_chain = stub(
+        lambda inputs: f"SELECT COUNT(*), AVG(salary), '{inputs['question']}' FROM employees"
+    )
+    agent.final_answer_chain = stub(lambda inputs: f"Answer based on {inputs['result'][:40]}")
+
+
+def start_server(app, port, threaded):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request access log
+    server = make_server("127.0.0.1", port, app, threaded=threaded)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fire(url, concurrency, requests_per_level):
+    session_local = threading.local()
+
+    def one(i):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(url, data={"query": f"question {i} {time.time_ns()}"},
+                                headers={"X-Requested-With": "XMLHttpRequest"}, timeout=300)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests_per_level)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", nargs="+", default=["async", "sync"], choices=["async", "sync"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.25, help="Seconds per stub LLM call")
+    parser.add_argument("--port", type=int, default=5077)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="load_test_"))  # The app's relative database paths resolve here
+    conn = sqlite3.connect("mydatabase.db")
+    conn.execute("CREATE TABLE employees (id INTEGER, country TEXT, salary REAL)")
+    conn.executemany("INSERT INTO employees VALUES (?, ?, ?)",
+                     [(i, ["US", "UK", "IN"][i % 3], 1000.0 + i) for i in range(10000)])
+    conn.commit()
+    conn.close()
+
+    import ai_agent_response as agent
+    import app as webapp
+
+    install_stub_llm(agent, args.llm_latency)
+    print(f"stub LLM latency {args.llm_latency:.2f}s per call, {args.requests} requests per level")
+    print(f"{'mode':>6} {'conc':>5} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for port_offset, mode in enumerate(args.mode):
+        if mode == "sync":
+            webapp.agent_response_async = agent.agent_response   # returns the answer directly
+            webapp.run_async = lambda result: result
+        server = start_server(webapp.app, args.port + port_offset, threaded=(mode == "async"))
+        url = f"http://127.0.0.1:{args.port + port_offset}/"
+        try:
+            for concurrency in args.concurrency:
+                stats = fire(url, concurrency, args.requests)
+                print(f"{mode:>6} {concurrency:>5} {stats['throughput']:>8.1f} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
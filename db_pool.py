@@ -0,0 +1,167 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# --- Configuration ---
+POOL_SIZE = 8                 # Maximum connections handed out per database at the same time
+POOL_TIMEOUT = 30             # Seconds to wait for a free connection before giving up
+BUSY_TIMEOUT = 30             # Seconds a connection waits on a locked database (sqlite3 timeout)
+SHARED_MEMORY_NAME = "chatbot"  # Name of the shared in-memory database used for ":memory:"
+
+# --- URI Handling ---
+def resolve_uri(database):
+    """
+    Turns a database path into the SQLite URI the pool connects with.
+
+    ":memory:" maps to one named, shared-cache in-memory database so every pooled
+    connection in the process (loader and agent alike) sees the same data. Plain
+    sqlite3.connect(":memory:") would give each connection its own empty database.
+    Explicit "file:" URIs are passed through unchanged.
+
+    Returns:
+        tuple: (uri, is_memory)
+    """
+    if database == ":memory:":
+        return f"file:{SHARED_MEMORY_NAME}?mode=memory&cache=shared", True
+    if database.startswith("file:"):
+        return database, "mode=memory" in database
+    return "file:" + pathname2url(os.path.abspath(database)), False
+
+# --- Connection Pool ---
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable SQLite connections for a single database.
+
+    Read-only pools open files with the mode=ro URI parameter (in-memory databases
+    use PRAGMA query_only instead). A connection is only ever used by one thread at
+    a time; any transaction left open when it is returned is rolled back.
+    """
+    def __init__(self, database, read_only=False, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.database = database
+        self.uri, self.is_memory = resolve_uri(database)
+        self.read_only = read_only
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        # A shared in-memory database is dropped when its last connection closes,
+        # so keep one open for the lifetime of the pool.
+        self._anchor = self._connect() if self.is_memory else None
+
+    def _connect(self):
+        uri = self.uri
+        if self.read_only and not self.is_memory:
+            uri += ("&" if "?" in uri else "?") + "mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        if self.read_only and self.is_memory:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of a with-block.
+        Unlike sqlite3's own context manager this does not commit; callers commit explicitly.
+        """
+        if not self._slots.acquire(timeout=self._timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Closes all idle connections (and the in-memory anchor, dropping that database)."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+_pools = {}
+_bootstrapped = set()
+_watchers = {}
+_writer_locks = {}
+_lock = threading.Lock()
+
+def get_pool(database, read_only=False):
+    """
+    Returns the process-wide pool for a database, creating it on first use.
+    Paths that resolve to the same URI share a pool.
+    """
+    key = (resolve_uri(database)[0], read_only)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(database, read_only=read_only)
+        return pool
+
+def writer_lock(database):
+    """
+    Returns the process-wide lock that serializes writers to a database (loads, index
+    builds). SQLite allows one writer at a time; a writer that doesn't hold the lock
+    can fail with "database is locked" while a long load is running.
+    """
+    uri = resolve_uri(database)[0]
+    with _lock:
+        return _writer_locks.setdefault(uri, threading.RLock())
+
+def bootstrap(database, statements):
+    """
+    Runs schema statements (e.g. CREATE TABLE IF NOT EXISTS) once per database per process.
+    Modules with tables of their own in a shared database each bootstrap their statements.
+    """
+    uri = resolve_uri(database)[0]
+    key = (uri, tuple(statements))
+    if key in _bootstrapped:
+        return
+    # Statements must be idempotent: two threads may race through the first call
+    with get_pool(database).connection() as conn:
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+    _bootstrapped.add(key)
+
+def data_version(database):
+    """
+    Returns a counter that changes whenever any connection commits to the database.
+
+    PRAGMA data_version only reflects commits made by *other* connections, so it is
+    read from a dedicated watcher connection that never writes. The value is only
+    comparable within one process.
+    """
+    uri = resolve_uri(database)[0]
+    with _lock:
+        watcher = _watchers.get(uri)
+        if watcher is None:
+            # A single-connection pool, so every read goes through the same connection
+            watcher = _watchers[uri] = ConnectionPool(database, read_only=True, max_size=1)
+    with watcher.connection() as conn:
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+def close_all():
+    """
+    Closes every pool. Bootstrapped schemas are re-checked on next use.
+    """
+    with _lock:
+        for pool in _pools.values():
+            pool.close()
+        for watcher in _watchers.values():
+            watcher.close()
+        _pools.clear()
+        _watchers.clear()
+        _bootstrapped.clear()
@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import background
+from db_pool import get_pool, bootstrap
+
+# --- Configuration ---
+PAGE_SIZE = 50               # Interactions per history page
+MAX_PAGE_SIZE = 200          # Largest page a client may ask for
+COMPRESS_AFTER_DAYS = 7      # Older sql_result payloads are stored zlib-compressed
+COMPRESS_MIN_BYTES = 1024    # Shorter payloads aren't worth compressing
+TRUNCATE_AFTER_DAYS = 90     # Older sql_result payloads keep only a preview
+RESULT_PREVIEW_CHARS = 500   # Kept characters of a truncated payload (below COMPRESS_MIN_BYTES)
+DELETE_AFTER_DAYS = None     # Interactions older than this are deleted; None keeps the whole history
+COMPACT_BATCH = 500          # Rows rewritten per transaction while compacting
+VACUUM_PAGES = 2000          # Free pages handed back to the file system per compaction
+COMPACT_EVERY = 200          # Logged interactions between automatic compactions
+
+# The timestamp index serves keyset pagination; the FTS5 index (external content,
+# kept in sync by triggers) serves search over past questions and answers.
+HISTORY_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS memory_logs_timestamp ON memory_logs (timestamp, id)",
+]
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS memory_logs_fts USING fts5(
+        user_query, final_answer, content='memory_logs', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_logs_fts_insert AFTER INSERT ON memory_logs BEGIN
+        INSERT INTO memory_logs_fts (rowid, user_query, final_answer)
+        VALUES (new.id, new.user_query, new.final_answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_logs_fts_delete AFTER DELETE ON memory_logs BEGIN
+        INSERT INTO memory_logs_fts (memory_logs_fts, rowid, user_query, final_answer)
+        VALUES ('delete', old.id, old.user_query, old.final_answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_logs_fts_update AFTER UPDATE OF user_query, final_answer ON memory_logs BEGIN
+        INSERT INTO memory_logs_fts (memory_logs_fts, rowid, user_query, final_answer)
+        VALUES ('delete', old.id, old.user_query, old.final_answer);
+        INSERT INTO memory_logs_fts (rowid, user_query, final_answer)
+        VALUES (new.id, new.user_query, new.final_answer);
+    END
+    """,
+]
+
+_fts_available = {}          # memory_db_path -> whether SQLite has FTS5
+_lock = threading.Lock()
+
+def init_history(memory_db_path):
+    """
+    Creates the history indexes once memory_logs exists. Logs written before the
+    FTS index existed are indexed on the first call.
+    """
+    if memory_db_path in _fts_available:
+        return
+    bootstrap(memory_db_path, HISTORY_SCHEMA)
+    try:
+        bootstrap(memory_db_path, FTS_SCHEMA)
+        with get_pool(memory_db_path).connection() as conn:
+            indexed = conn.execute("SELECT COUNT(*) FROM memory_logs_fts_docsize").fetchone()[0]
+            logged = conn.execute("SELECT COUNT(*) FROM memory_logs").fetchone()[0]
+            if indexed != logged:
+                conn.execute("INSERT INTO memory_logs_fts (memory_logs_fts) VALUES ('rebuild')")
+                conn.commit()
+        available = True
+    except sqlite3.OperationalError:
+        available = False  # SQLite built without FTS5: search falls back to LIKE
+    with _lock:
+        _fts_available[memory_db_path] = available
+
+# --- Pagination and Search ---
+def encode_cursor(timestamp, row_id) -> str:
+    return f"{timestamp}~{row_id}"
+
+def decode_cursor(cursor):
+    """
+    Returns the (timestamp, id) of a cursor from encode_cursor, or None if it is malformed.
+    """
+    timestamp, _, row_id = (cursor or "").rpartition("~")
+    return (timestamp, int(row_id)) if timestamp and row_id.isdigit() else None
+
+def fts_query(text) -> str:
+    """
+    Turns free text into an FTS5 query matching every word as a prefix, so user input
+    never hits FTS5's query syntax.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+def history_page(memory_db_path, before=None, search=None, limit=PAGE_SIZE):
+    """
+    Returns one page of logged interactions, newest first, and the cursor of the next
+    (older) page or None. Pages are keyset-paginated on (timestamp, id), so a page
+    costs the same however deep it is.
+
+    before: a cursor from a previous page; search: free text matched against past
+    questions and answers.
+    """
+    init_history(memory_db_path)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions, params = [], []
+    position = decode_cursor(before)
+    if position:
+        conditions.append("(m.timestamp, m.id) < (?, ?)")
+        params.extend(position)
+    source = "memory_logs m"
+    if search and search.strip():
+        if _fts_available.get(memory_db_path):
+            source = "memory_logs_fts f JOIN memory_logs m ON m.id = f.rowid"
+            conditions.append("memory_logs_fts MATCH ?")
+            params.append(fts_query(search))
+        else:
+            conditions.append("(m.user_query LIKE ? OR m.final_answer LIKE ?)")
+            params.extend([f"%{search.strip()}%"] * 2)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    with get_pool(memory_db_path, read_only=True).connection() as conn:
+        rows = conn.execute(f"""
+            SELECT m.id, m.timestamp, m.user_query, m.sql_query, m.final_answer FROM {source}
+            {where} ORDER BY m.timestamp DESC, m.id DESC LIMIT ?
+        """, params + [limit + 1]).fetchall()
+    interactions = [{"id": row[0], "timestamp": row[1], "user_query": row[2], "sql_query": row[3],
+                     "final_answer": row[4]} for row in rows[:limit]]
+    last = interactions[-1] if len(rows) > limit else None
+    return interactions, last and encode_cursor(last["timestamp"], last["id"])
+
+# --- Retention and Compaction ---
+def result_text(value):
+    """
+    Returns a logged sql_result as text, decompressing payloads compacted by compact_history.
+    """
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+def _truncate(text):
+    return text[:RESULT_PREVIEW_CHARS] + f"... [{len(text) - RESULT_PREVIEW_CHARS} characters removed]"
+
+def _rewrite(conn, select, params, rewrite):
+    """
+    Rewrites sql_result for the rows an (id, sql_result) query returns, in batches.
+    Returns the number of rows rewritten.
+    """
+    count = 0
+    while True:
+        rows = conn.execute(select + " LIMIT ?", params + [COMPACT_BATCH]).fetchall()
+        if not rows:
+            return count
+        conn.executemany("UPDATE memory_logs SET sql_result = ? WHERE id = ?",
+                         [(rewrite(value), row_id) for row_id, value in rows])
+        conn.commit()
+        count += len(rows)
+
+def compact_history(memory_db_path, now=None) -> dict:
+    """
+    Applies the retention policy to memory_logs: deletes interactions older than
+    DELETE_AFTER_DAYS, truncates sql_result payloads older than TRUNCATE_AFTER_DAYS,
+    compresses those older than COMPRESS_AFTER_DAYS, and returns the freed pages to
+    the file system with an incremental vacuum. Questions and answers are never
+    shortened. Returns a report with the affected row and page counts.
+    """
+    init_history(memory_db_path)
+    now = now or datetime.now()
+
+    def cutoff(days):
+        return (now - timedelta(days=days)).isoformat()
+
+    report = {"deleted": 0, "truncated": 0, "compressed": 0, "freed_pages": 0}
+    with get_pool(memory_db_path).connection() as conn:
+        if DELETE_AFTER_DAYS is not None:
+            report["deleted"] = conn.execute("DELETE FROM memory_logs WHERE timestamp < ?",
+                                             (cutoff(DELETE_AFTER_DAYS),)).rowcount
+            conn.commit()
+        # Compressed payloads and long text both qualify; a truncated preview is shorter than COMPRESS_MIN_BYTES
+        report["truncated"] = _rewrite(conn, """
+            SELECT id, sql_result FROM memory_logs WHERE timestamp < ?
+            AND (typeof(sql_result) = 'blob' OR length(sql_result) >= ?)
+        """, [cutoff(TRUNCATE_AFTER_DAYS), COMPRESS_MIN_BYTES], lambda value: _truncate(result_text(value)))
+        report["compressed"] = _rewrite(conn, """
+            SELECT id, sql_result FROM memory_logs WHERE timestamp < ?
+            AND typeof(sql_result) = 'text' AND length(sql_result) >= ?
+        """, [cutoff(COMPRESS_AFTER_DAYS), COMPRESS_MIN_BYTES], lambda value: zlib.compress(value.encode("utf-8")))
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # auto_vacuum can only change with a full VACUUM; this happens once per file
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        report["freed_pages"] = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return report
+
+_compaction = background.CountedJob(compact_history)
+
+def submit_compaction(memory_db_path):
+    """
+    Runs compact_history as a background job, unless one is still queued or running.
+    Returns the job id.
+    """
+    return _compaction.submit(memory_db_path)
+
+def note_interaction(memory_db_path):
+    """
+    Counts logged interactions and compacts the history every COMPACT_EVERY of them.
+    """
+    _compaction.note(COMPACT_EVERY, memory_db_path)
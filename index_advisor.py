@@ -0,0 +1,208 @@
+import re
+import sqlite3
+import time
+from collections import Counter
+
+import background
+import query_guard
+import schema_catalog
+from db_pool import get_pool, writer_lock
+
+# --- Configuration ---
+HISTORY_QUERIES = 500        # Most recent logged queries the advice is based on
+MIN_QUERY_COUNT = 3          # Logged queries that must use a column before it gets an index
+MIN_TABLE_ROWS = 1000        # Smaller tables are scanned quickly enough without indexes
+MAX_AUTO_INDEXES = 5         # Advisor-created indexes per table
+REPLAY_QUERIES = 20          # Most frequent logged queries timed before and after the change
+REPLAY_RUNS = 3              # Timings per query (the best one counts)
+ADVISE_EVERY = 50            # Logged interactions between automatic advisor runs
+AUTO_INDEX_PREFIX = "auto_idx_"  # Only indexes with this prefix are ever dropped
+
+# --- Query Parsing ---
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_COLUMN = r'(?:("[^"]+"|\w+)\s*\.\s*)?("[^"]+"|\w+)'
+_LOWER_COLUMN = r'LOWER\s*\(\s*' + _COLUMN + r'\s*\)'
+# Operators an index can serve (LIKE can't use a plain index in SQLite)
+_FILTER = re.compile(rf'(?:{_LOWER_COLUMN}|{_COLUMN})\s*(?:==?|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)', re.IGNORECASE)
+# Right-hand side of equalities, for join conditions such as a.Id = b.EmployeeId
+_JOIN = re.compile(rf'==?\s*(?:{_LOWER_COLUMN}|{_COLUMN})', re.IGNORECASE)
+_GROUP_BY = re.compile(r'\bGROUP\s+BY\s+(.+?)(?=\bHAVING\b|\bORDER\b|\bLIMIT\b|\bUNION\b|\)|;|$)',
+                       re.IGNORECASE | re.DOTALL)
+_GROUP_ITEM = re.compile(rf'^\s*(?:{_LOWER_COLUMN}|{_COLUMN})\s*$', re.IGNORECASE)
+
+def _resolve(qualifier, column, references, columns):
+    """
+    Finds the table and exact name of a column reference, or None if it isn't a
+    column of exactly one table the query reads from.
+    """
+    column = query_guard.unquote(column).lower()
+    if qualifier:
+        tables = [references.get(query_guard.unquote(qualifier).lower())]
+    else:
+        tables = set(references.values())
+    matches = [(table, name) for table in tables if table in columns
+               for name, _ in columns[table] if name.lower() == column]
+    return matches[0] if len(matches) == 1 else None
+
+def index_candidates(sql: str, snapshot) -> set:
+    """
+    Returns the (table, column, lowered) keys a query filters, joins or groups on;
+    lowered marks a LOWER(column) use, served by an expression index.
+    """
+    sql = _STRING.sub("''", sql)
+    references = query_guard.table_references(sql, snapshot.tables)
+    keys = set()
+
+    def add(match):
+        lowered = match.group(2) is not None
+        qualifier, column = (match.group(1), match.group(2)) if lowered else (match.group(3), match.group(4))
+        resolved = _resolve(qualifier, column, references, snapshot.columns)
+        if resolved:
+            keys.add((resolved[0], resolved[1], lowered))
+
+    for match in _FILTER.finditer(sql):
+        add(match)
+    for match in _JOIN.finditer(sql):
+        add(match)
+    for clause in _GROUP_BY.finditer(sql):
+        for item in clause.group(1).split(","):
+            match = _GROUP_ITEM.match(item)
+            if match:
+                add(match)
+    return keys
+
+# --- Index Management ---
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def index_name(table, column, lowered) -> str:
+    name = f"{AUTO_INDEX_PREFIX}{table}_{column}" + ("_lower" if lowered else "")
+    return re.sub(r"\W+", "_", name)
+
+def index_sql(table, column, lowered) -> str:
+    target = f"LOWER({_quote(column)})" if lowered else _quote(column)
+    return f"CREATE INDEX IF NOT EXISTS {_quote(index_name(table, column, lowered))} ON {_quote(table)} ({target})"
+
+def existing_indexes(conn) -> dict:
+    """
+    Returns index name -> (table, leading column or None for expressions).
+    """
+    indexes = {}
+    for name, table in conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'"):
+        leading = conn.execute("SELECT name FROM pragma_index_info(?) WHERE seqno = 0", (name,)).fetchone()
+        indexes[name] = (table, leading[0] if leading else None)
+    return indexes
+
+def logged_queries(memory_db_path, failed_results=(), limit=HISTORY_QUERIES) -> list:
+    """
+    Returns the SQL of the most recent logged interactions, skipping those whose
+    sql_result is one of failed_results.
+    """
+    errors = sorted(failed_results)
+    skip_failed = f"AND sql_result NOT IN ({', '.join('?' for _ in errors)})" if errors else ""
+    try:
+        with get_pool(memory_db_path, read_only=True).connection() as conn:
+            rows = conn.execute(f"""
+                SELECT sql_query FROM memory_logs
+                WHERE sql_query IS NOT NULL AND UPPER(sql_query) != 'NO_SQL' {skip_failed}
+                ORDER BY id DESC LIMIT ?
+            """, errors + [limit]).fetchall()
+    except sqlite3.OperationalError:
+        return []  # No memory_logs yet
+    return [row[0] for row in rows]
+
+def recommend(queries, snapshot, conn):
+    """
+    Counts how many logged queries use each column and decides which advisor indexes
+    should exist. Returns (indexes to create as {name: key}, advisor index names to drop).
+    """
+    usage = Counter()
+    for sql in queries:
+        usage.update(index_candidates(sql, snapshot))
+    existing = existing_indexes(conn)
+    covered = {(table, column) for table, column in existing.values() if column}
+    wanted, per_table = {}, Counter()
+    for key, count in usage.most_common():
+        table, column, lowered = key
+        if count < MIN_QUERY_COUNT or per_table[table] >= MAX_AUTO_INDEXES:
+            continue
+        if not lowered and (table, column) in covered:
+            continue  # An index already leads with this column
+        if query_guard.estimate_rows(conn, table) < MIN_TABLE_ROWS:
+            continue
+        per_table[table] += 1
+        wanted[index_name(*key)] = key
+    used = {index_name(*key) for key in usage}
+    create = {name: key for name, key in wanted.items() if name not in existing}
+    # Advisor indexes nobody queried recently only slow down loads
+    drop = [name for name in existing if name.startswith(AUTO_INDEX_PREFIX) and name not in used]
+    return create, drop
+
+# --- Replay ---
+def time_query(db_path, sql, runs=REPLAY_RUNS):
+    """
+    Returns the best time in milliseconds to run and fetch a query, or None if it
+    failed or exceeded its budget.
+    """
+    best = None
+    sql = query_guard.add_limit(sql)
+    with get_pool(db_path, read_only=True).connection() as conn:
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                with query_guard.QueryBudget(conn):
+                    conn.execute(sql).fetchall()
+            except sqlite3.Error:
+                return None
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# --- Advisor ---
+def advise_indexes(db_path, memory_db_path, failed_results=()) -> dict:
+    """
+    Creates indexes for the columns that logged queries repeatedly filter, join or
+    group on (LOWER(column) uses get expression indexes), drops advisor indexes that
+    are no longer used, runs ANALYZE, and replays the most frequent logged queries
+    before and after the change.
+    Returns a report with the created and dropped indexes and per-query timings.
+    """
+    queries = logged_queries(memory_db_path, failed_results)
+    snapshot = schema_catalog.get_snapshot(db_path)
+    with get_pool(db_path).connection() as conn:
+        create, drop = recommend(queries, snapshot, conn)
+    report = {"queries_analyzed": len(queries), "created": sorted(create), "dropped": sorted(drop), "replay": []}
+    if not create and not drop:
+        return report
+
+    replay = [sql for sql, _ in Counter(queries).most_common(REPLAY_QUERIES)]
+    before = [time_query(db_path, sql) for sql in replay]
+    # Index builds wait for running loads instead of failing with SQLITE_BUSY
+    with writer_lock(db_path), get_pool(db_path).connection() as conn:
+        for name in drop:
+            conn.execute(f"DROP INDEX IF EXISTS {_quote(name)}")
+        for key in create.values():
+            conn.execute(index_sql(*key))
+        conn.execute("ANALYZE")
+        conn.commit()
+    after = [time_query(db_path, sql) for sql in replay]
+    for sql, old, new in zip(replay, before, after):
+        speedup = round(old / new, 2) if old and new else None
+        report["replay"].append({"sql": sql, "before_ms": old and round(old, 3),
+                                 "after_ms": new and round(new, 3), "speedup": speedup})
+    return report
+
+_advisor = background.CountedJob(advise_indexes)
+
+def submit_advisor(db_path, memory_db_path, failed_results=()):
+    """
+    Runs advise_indexes as a background job, unless one is still queued or running.
+    Returns the job id.
+    """
+    return _advisor.submit(db_path, memory_db_path, failed_results)
+
+def note_interaction(db_path, memory_db_path, failed_results=()):
+    """
+    Counts logged interactions and starts the advisor every ADVISE_EVERY of them.
+    """
+    _advisor.note(ADVISE_EVERY, db_path, memory_db_path, failed_results)
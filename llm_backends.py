@@ -0,0 +1,92 @@
+import asyncio
+import re
+import time
+from typing import Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+# --- Configuration ---
+BACKENDS = ("azure", "fake")
+
+# --- Fake Backend ---
+# The SQL retry prompt puts the failed query and its error between the question and "SQL Query:"
+_QUESTION = re.compile(r"User Question:\s*(.*?)\s*(?:Failed SQL Query:.*)?SQL Query:\s*$", re.DOTALL)
+_TABLE = re.compile(r'CREATE TABLE\s+("(?:[^"]|"")+"|\S+)\s*\((.*)\)', re.DOTALL)
+_COLUMN = re.compile(r'^\s*("(?:[^"]|"")+"|\w+)', re.MULTILINE)
+_RESULT = re.compile(r"SQL Result:\s*(.*?)\s*Final Answer:\s*$", re.DOTALL)
+
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for benchmarks and demos without credentials.
+    It recognizes the agent's three prompts by their closing line:
+
+        "SQL Query:"      returns the canned SQL for the question (see `sql`), or NO_SQL
+                          (SQL retries get the same canned SQL again)
+        "Table Summary:"  lists the table's columns
+        "Final Answer:"   restates the start of the SQL result
+
+    Any other prompt is handled by `respond` if given, else echoed back. Each call
+    sleeps `latency` seconds to stand in for the network, and reports token usage
+    as characters / 4, like the real model would report its counts.
+    """
+    sql: dict = Field(default_factory=dict)       # question (case and spacing ignored) -> SQL
+    latency: float = 0.0                          # Seconds per call
+    respond: Optional[Callable[[str], str]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def add_sql(self, question: str, sql: str):
+        self.sql[normalize(question)] = sql
+
+    def reply(self, prompt: str) -> str:
+        prompt = prompt.rstrip()
+        if prompt.endswith("SQL Query:"):
+            match = _QUESTION.search(prompt)
+            return self.sql.get(normalize(match.group(1)) if match else "", "NO_SQL")
+        if prompt.endswith("Table Summary:"):
+            match = _TABLE.search(prompt)
+            if match:
+                columns = ", ".join(name for name in _COLUMN.findall(match.group(2)) if name.upper() != "CREATE")
+                return f"Table {match.group(1)} with columns {columns}."
+        if prompt.endswith("Final Answer:"):
+            match = _RESULT.search(prompt)
+            return f"According to the data: {match.group(1)[:200] if match else ''}"
+        return self.respond(prompt) if self.respond else prompt
+
+    def _result(self, messages) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self.reply(prompt)
+        usage = {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4,
+                 "total_tokens": len(prompt) // 4 + len(text) // 4}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+# --- Backend Factory ---
+def create_llm(backend: str, max_tokens: int, **settings):
+    """
+    Builds the chat model for a backend: "azure" (AzureChatOpenAI with the given
+    settings) or "fake" (FakeChatModel, settings ignored).
+    """
+    if backend == "azure":
+        from langchain_openai import AzureChatOpenAI
+        return AzureChatOpenAI(max_tokens=max_tokens, **settings)
+    if backend == "fake":
+        return FakeChatModel()
+    raise ValueError(f"Unknown LLM backend '{backend}' (use {', '.join(BACKENDS)})")
@@ -1,22 +1,98 @@
 import requests
 import pandas as pd
 import sqlite3
+import csv
+import hashlib
+import http.cookiejar
 import io
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from collections import namedtuple
 from datetime import datetime
+from db_pool import get_pool, bootstrap, writer_lock
+import schema_catalog
+import source_registry
+import table_index
+import tracing
 
 # Define the SQLite database path (change to shift to using in memory database, also change in ai_agent_response.py file to connect)
+# ":memory:" is shared with ai_agent_response through db_pool, so both modules see the same tables.
 DB_PATH = "mydatabase.db"
+SOURCES_DB_PATH = "memory.db"  # Holds the URL -> table registry (see source_registry.py)
+
+# Streaming ingestion settings
+CHUNK_SIZE = 50000          # Rows parsed and written per chunk (None/0 buffers the whole body instead)
+SNIFF_BYTES = 64 * 1024     # Size of the first block used to sniff the CSV delimiter
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl",
+                        "application/x-jsonlines", "application/json-lines", "application/jsonlines")
+
+# Bulk write settings
+BATCH_SIZE = 10000          # Rows bound per executemany call
+# WAL lets the agent's readers run during a load. It is persistent and set once per database:
+# switching back after each load fails with "database is locked" while any reader is open.
+DB_SETUP = ["PRAGMA journal_mode = WAL"]
+INGEST_PRAGMAS = {          # Per-connection settings applied for the duration of a load, then restored
+    "synchronous": "NORMAL",
+    "cache_size": -262144,  # Negative values are KiB, i.e. 256 MiB
+    "temp_store": "MEMORY",
+}
+
+# Batch ingestion settings
+BATCH_WORKERS = 4           # URLs downloaded and parsed at the same time
+PREFETCH_CHUNKS = 2         # Parsed chunks a URL may queue while waiting for the writer
+
+# Source refresh settings
+DEFAULT_REFRESH_MODE = "replace"  # How a changed URL updates its table: replace, append or upsert
+UNCHANGED_RESULT = "Unchanged: the data is the same as in the last load."
 
 ### Helper Functions
 
 #### Fetch Data from URL
-def fetch_data(url, token=None):
+_sessions = {}              # (scheme, host) -> requests.Session
+_sessions_lock = threading.Lock()
+
+def get_session(url):
+    """
+    Returns the requests.Session for a URL's host, so repeated downloads from one
+    host reuse its kept-alive connections. The session is shared by every user's
+    loads, so it never stores cookies: one user's authenticated download must not
+    leave a session cookie that the next user's request would send.
+
+    Args:
+        url (str): The URL about to be fetched.
+
+    Returns:
+        requests.Session: The shared session for the URL's scheme and host.
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=BATCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+@tracing.traced("ingest", "fetch")
+def fetch_data(url, token=None, stream=False, headers=None):
     """
     Fetches data from a given URL, optionally with OAuth token.
 
     Args:
         url (str): The URL to fetch data from.
         token (str, optional): OAuth token for authentication.
+        stream (bool, optional): If True, the body is left on the socket to be read incrementally.
+        headers (dict, optional): Extra request headers, e.g. If-None-Match for a conditional GET.
 
     Returns:
         requests.Response: The response object containing the data.
@@ -24,11 +100,11 @@ def fetch_data(url, token=None):
     Raises:
         Exception: If the request fails (e.g., network error, invalid URL).
     """
-    headers = {}
+    headers = dict(headers or {})
     if token:
         headers['Authorization'] = f'Bearer {token}'
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session(url).get(url, headers=headers, stream=stream)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         return response
     except requests.RequestException as e:
@@ -49,32 +125,68 @@ def process_json(response):
         Exception: If JSON parsing fails.
     """
     try:
-        json_data = response.json()  # Parse JSON content
-        if isinstance(json_data, list):
-            # Directly handle a list of dictionaries or records
-            df = pd.json_normalize(json_data)
-        elif isinstance(json_data, dict):
-            # Look for a key containing a list or dict to flatten
-            data_key = next((key for key in json_data if isinstance(json_data[key], (list, dict))), None)
-            if data_key and isinstance(json_data[data_key], list):
-                df = pd.json_normalize(json_data[data_key])  # Flatten the list
-            elif data_key and isinstance(json_data[data_key], dict):
-                sub_key = next((k for k in json_data[data_key] if isinstance(json_data[data_key][k], list)), None)
-                if sub_key:
-                    df = pd.json_normalize(json_data[data_key][sub_key])
-                else:
-                    df = pd.json_normalize(json_data[data_key])
-            else:
-                # Handle a single dictionary with no nested list
-                df = pd.json_normalize(json_data)
-        else:
-            raise Exception("JSON data must be a list or dictionary")
-        
+        return normalize_json(response.json())  # Parse JSON content
+    except Exception as e:
+        raise Exception(f"Failed to parse JSON: {e}")
+
+def process_ndjson(response):
+    """
+    Parses NDJSON / JSON Lines data (one JSON record per line) into a pandas DataFrame.
+
+    Args:
+        response (requests.Response): The response object with NDJSON content.
+
+    Returns:
+        pd.DataFrame: The parsed DataFrame.
+
+    Raises:
+        Exception: If NDJSON parsing fails.
+    """
+    try:
+        records = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+        df = pd.json_normalize(records)
         if df.empty:
-            raise Exception("No tabular data found in JSON")
+            raise Exception("No tabular data found in NDJSON")
         return df
     except Exception as e:
-        raise Exception(f"Failed to parse JSON: {e}")
+        raise Exception(f"Failed to parse NDJSON: {e}")
+
+def normalize_json(json_data):
+    """
+    Flattens parsed JSON into a pandas DataFrame, handling various structures.
+
+    Args:
+        json_data (list | dict): The parsed JSON content.
+
+    Returns:
+        pd.DataFrame: The flattened DataFrame.
+
+    Raises:
+        Exception: If no tabular data is found.
+    """
+    if isinstance(json_data, list):
+        # Directly handle a list of dictionaries or records
+        df = pd.json_normalize(json_data)
+    elif isinstance(json_data, dict):
+        # Look for a key containing a list or dict to flatten
+        data_key = next((key for key in json_data if isinstance(json_data[key], (list, dict))), None)
+        if data_key and isinstance(json_data[data_key], list):
+            df = pd.json_normalize(json_data[data_key])  # Flatten the list
+        elif data_key and isinstance(json_data[data_key], dict):
+            sub_key = next((k for k in json_data[data_key] if isinstance(json_data[data_key][k], list)), None)
+            if sub_key:
+                df = pd.json_normalize(json_data[data_key][sub_key])
+            else:
+                df = pd.json_normalize(json_data[data_key])
+        else:
+            # Handle a single dictionary with no nested list
+            df = pd.json_normalize(json_data)
+    else:
+        raise Exception("JSON data must be a list or dictionary")
+    
+    if df.empty:
+        raise Exception("No tabular data found in JSON")
+    return df
 
 #### Process CSV Data
 def process_csv(response):
@@ -98,7 +210,324 @@ def process_csv(response):
     except Exception as e:
         raise Exception(f"Failed to parse CSV: {e}")
 
+#### Streaming Helpers
+class _ChainedStream(io.RawIOBase):
+    """
+    Read-only raw stream that replays an already consumed head block before
+    continuing with the remainder of the underlying response stream. Bytes read
+    from the response are also fed to an optional hashlib object.
+    """
+    def __init__(self, head, raw, hasher=None):
+        self._head = head
+        self._raw = raw
+        self._hasher = hasher
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._head:
+            n = min(len(buffer), len(self._head))
+            buffer[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._raw.read(len(buffer))
+        if self._hasher is not None:
+            self._hasher.update(data)
+        n = len(data)
+        buffer[:n] = data
+        return n
+
+def open_stream(response, hasher=None):
+    """
+    Reads the first block of a streamed response and returns it together with
+    a text stream that yields the full body (head included).
+
+    Args:
+        response (requests.Response): A response fetched with stream=True.
+        hasher (optional): A hashlib object updated with the body as it is read.
+
+    Returns:
+        tuple: (head, stream) where head is the decoded first block (str) and
+        stream is a text file object over the complete body.
+    """
+    response.raw.decode_content = True  # Transparently handle gzip/deflate
+    head = response.raw.read(SNIFF_BYTES)
+    if hasher is not None:
+        hasher.update(head)
+    encoding = response.encoding or 'utf-8'
+    stream = io.TextIOWrapper(io.BufferedReader(_ChainedStream(head, response.raw, hasher)), encoding=encoding, newline='')
+    return head.decode(encoding, errors='ignore'), stream
+
+def sniff_delimiter(head):
+    """
+    Detects the CSV delimiter from the first block of the body.
+
+    Args:
+        head (str): The first block of CSV text.
+
+    Returns:
+        str: The detected delimiter, defaulting to ',' when sniffing fails.
+    """
+    # Only sniff complete lines so a partially read row doesn't skew the result
+    sample = head[:head.rfind('\n')] if '\n' in head else head
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ','
+
+#### Process CSV Data in Chunks
+def process_csv_stream(stream, head, chunk_size=CHUNK_SIZE):
+    """
+    Parses streamed CSV data into DataFrame chunks of a fixed number of rows.
+
+    Args:
+        stream (io.TextIOBase): Text stream over the CSV body (see open_stream).
+        head (str): The first block of the body, used to sniff the delimiter.
+        chunk_size (int, optional): Number of rows per chunk.
+
+    Yields:
+        pd.DataFrame: The parsed chunks.
+
+    Raises:
+        Exception: If CSV parsing fails.
+    """
+    try:
+        reader = pd.read_csv(stream, sep=sniff_delimiter(head), chunksize=chunk_size)
+        for chunk in reader:
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Failed to parse CSV: {e}")
+
+#### Process JSON Data Incrementally
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+class _JsonScanner:
+    """
+    Minimal incremental reader used to walk a JSON document held in a text stream.
+    Only the current token (or array element) is kept in memory.
+    """
+    def __init__(self, stream, block_size=SNIFF_BYTES):
+        self._stream = stream
+        self._block_size = block_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size):
+        if self._eof:
+            return False
+        data = self._stream.read(size)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + data  # Drop what has been consumed
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ('' at the end)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill(self._block_size):
+                return ""
+
+    def expect(self, chars):
+        """Consumes the next character, which must be one of chars, and returns it."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise Exception(f"Expected one of {chars!r} but found {char or 'end of data'!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decodes and consumes the next complete JSON value."""
+        self.peek()
+        size = self._block_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value ending exactly at the buffer end may be a truncated number
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2  # Grow reads for values larger than a block
+
+    def items(self):
+        """Consumes an object's opening brace and yields its keys; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.expect("}")
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def elements(self):
+        """Consumes an array and yields its elements one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+def iter_json_records(stream):
+    """
+    Yields the records of a streamed JSON document, using the same heuristic as
+    normalize_json: a top-level list, the first list (or dict) under a top-level key,
+    or the first list nested one level inside that dict. Documents without such a
+    list yield a single record.
+
+    Args:
+        stream (io.TextIOBase): Text stream over the JSON body.
+
+    Yields:
+        The decoded records.
+
+    Raises:
+        Exception: If the JSON is malformed or not a list or dictionary.
+    """
+    scanner = _JsonScanner(stream)
+    first = scanner.peek()
+    if first == "[":
+        yield from scanner.elements()
+    elif first == "{":
+        record = {}
+        for key in scanner.items():
+            char = scanner.peek()
+            if char == "[":
+                # Flatten the list
+                yield from scanner.elements()
+                return
+            if char == "{":
+                nested = {}
+                for sub_key in scanner.items():
+                    if scanner.peek() == "[":
+                        yield from scanner.elements()
+                        return
+                    nested[sub_key] = scanner.value()
+                yield nested
+                return
+            record[key] = scanner.value()
+        # Handle a single dictionary with no nested list
+        yield record
+    else:
+        raise Exception("JSON data must be a list or dictionary")
+
+def iter_ndjson_records(stream):
+    """
+    Yields the records of a streamed NDJSON / JSON Lines body.
+
+    Args:
+        stream (io.TextIOBase): Text stream over the NDJSON body.
+
+    Yields:
+        The decoded records, one per non-empty line.
+    """
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def looks_like_ndjson(head):
+    """
+    Checks whether the first block of a body is NDJSON rather than a single JSON document.
+
+    Args:
+        head (str): The first block of the body.
+
+    Returns:
+        bool: True if the first line is a complete JSON value followed by further lines.
+    """
+    lines = [line for line in head.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return False
+    try:
+        json.loads(lines[0])
+        return True
+    except ValueError:
+        return False
+
+def process_json_stream(records, chunk_size=CHUNK_SIZE, label="JSON"):
+    """
+    Flattens streamed JSON records into DataFrame chunks of a fixed number of rows.
+
+    Args:
+        records (iterable): Records from iter_json_records or iter_ndjson_records.
+        chunk_size (int, optional): Number of records per chunk.
+        label (str, optional): Format name used in error messages.
+
+    Yields:
+        pd.DataFrame: The flattened chunks.
+
+    Raises:
+        Exception: If JSON parsing fails.
+    """
+    try:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= chunk_size:
+                yield pd.json_normalize(batch)
+                batch = []
+        if batch:
+            yield pd.json_normalize(batch)
+    except Exception as e:
+        raise Exception(f"Failed to parse {label}: {e}")
+
 #### Preprocess DataFrame
+NESTED_SAMPLE_SIZE = 1000   # Leading non-null values checked before a full nested-value scan
+# infer_dtype results that can never contain lists or dicts
+SCALAR_INFERRED_TYPES = {"string", "bytes", "integer", "floating", "mixed-integer-float", "decimal",
+                         "boolean", "datetime", "datetime64", "date", "time", "timedelta", "empty"}
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+def has_nested_values(series):
+    """
+    Checks whether an object column contains lists or dictionaries.
+
+    A sample of the leading values is checked first; the rest of the column is only
+    scanned when pandas' C-level type inference cannot rule nested values out.
+
+    Args:
+        series (pd.Series): An object dtype column.
+
+    Returns:
+        bool: True if any value is a list or dict.
+    """
+    values = series.dropna()
+    if any(isinstance(x, (list, dict)) for x in values.iloc[:NESTED_SAMPLE_SIZE]):
+        return True
+    if pd.api.types.infer_dtype(values, skipna=True) in SCALAR_INFERRED_TYPES:
+        return False
+    return values.map(type).isin((list, dict)).any()
+
+def serialize_nested(series):
+    """
+    Serializes a column holding lists/dictionaries to JSON strings.
+
+    Args:
+        series (pd.Series): The column to serialize.
+
+    Returns:
+        pd.Series: The column with every non-null value as a string.
+    """
+    encode = _json_encoder.encode
+    return series.map(lambda x: encode(x) if isinstance(x, (list, dict)) else str(x), na_action="ignore")
+
 def preprocess_dataframe(df):
     """
     Preprocesses the DataFrame to ensure SQLite compatibility.
@@ -110,19 +539,265 @@ def preprocess_dataframe(df):
         pd.DataFrame: The preprocessed DataFrame.
     """
     for col in df.columns:
-        # Convert lists or dictionaries to strings
-        if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
-            df[col] = df[col].apply(str)
-        
+        # Convert lists or dictionaries to JSON strings (only object columns can hold them)
+        if df[col].dtype == object and has_nested_values(df[col]):
+            df[col] = serialize_nested(df[col])
+
         # Format datetime columns as strings
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
             df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
-        
-        # Replace NaN with None for SQLite NULL
-        df[col] = df[col].where(pd.notnull(df[col]), None)
-    
+
+    # Replace NaN with None for SQLite NULL, once for every non-numeric column that has gaps
+    # (numeric NaN is already stored as NULL by sqlite3)
+    candidates = [col for col in df.columns
+                  if not (pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]))]
+    if candidates:
+        missing = df[candidates].isna()
+        gaps = missing.columns[missing.any()]
+        if len(gaps):
+            df[gaps] = df[gaps].astype(object).where(~missing[gaps], None)
+
+    return df
+
+#### Infer Column Types
+INFER_TYPES = True            # Store numbers, booleans and dates found in text columns as typed values
+DICTIONARY_ENCODING = False   # Move repeated low-cardinality strings to lookup tables (queries then need a JOIN)
+CATEGORY_MAX_VALUES = 256     # Distinct values allowed in a dictionary-encoded column
+CATEGORY_MAX_RATIO = 0.05     # Distinct values per non-null value allowed in a dictionary-encoded column
+TYPE_SAMPLE_SIZE = 200        # Leading values checked before a whole column is tested (and used to find date formats)
+MAX_NUMBER_LENGTH = 15        # Longer digit strings (card numbers, long ids) stay text
+BOOLEAN_STRINGS = {"true": 1, "false": 0, "yes": 1, "no": 0}  # No single letters: F is a gender, N a grade
+DATE_FORMATS = ["ISO8601", "%m/%d/%Y", "%d/%m/%Y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+                "%d-%m-%Y", "%Y/%m/%d", "%d %b %Y", "%b %d, %Y", "%d %B %Y", "%B %d, %Y"]
+_LEADING_ZERO = r"^[+-]?0\d"  # Zip codes, account numbers etc. would lose their zeros as numbers
+_FULL_ISO_DATE = r"^\s*\d{4}-\d{2}-\d{2}"  # ISO8601 parsing also accepts "2020-1", which is no date
+
+# kind: "integer", "real", "boolean", "date", "datetime", "category" or "text"
+# sqlite_type: the declared column type
+# source: what the values were converted from ("text" or "float"), None if stored as parsed
+# detail: the date format for dates, otherwise None
+# codes: value -> code for categories (grows as later chunks bring new values), otherwise None
+ColumnType = namedtuple("ColumnType", ["kind", "sqlite_type", "source", "detail", "codes"])
+
+def _text_values(series):
+    """
+    Returns the non-blank values of a column as strings.
+    """
+    text = series.dropna().astype(str)
+    return text[text != ""]
+
+def _date_format(text):
+    """
+    Finds the first entry of DATE_FORMATS that parses every sampled value.
+    """
+    sample = text.iloc[:TYPE_SAMPLE_SIZE]
+    if not sample.str.contains(r"\d").all():
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = _parse_dates(sample, date_format)
+        except (ValueError, TypeError):
+            continue
+        if parsed.notna().all():
+            return date_format
+    return None
+
+def _parse_dates(text, date_format):
+    # Zoned values are converted to UTC; naive values are kept as they are
+    parsed = pd.to_datetime(text, format=date_format, errors="coerce", utc=True).dt.tz_localize(None)
+    if date_format == "ISO8601":
+        parsed = parsed.where(text.str.match(_FULL_ISO_DATE))
+    return parsed
+
+def _exact_numbers(text, numbers, kind):
+    """
+    Marks the values whose number prints back as the original text, so converting
+    them loses nothing ("1.10" would come back as 1.1, "+5" as 5).
+    """
+    def prints_as(value, original):
+        if value % 1 == 0 and abs(value) < 2 ** 53 and str(int(value)) == original:
+            return True
+        return kind == "real" and repr(float(value)) == original
+
+    valid = numbers.notna()
+    exact = [prints_as(value, original) for value, original in zip(numbers[valid].tolist(), text[valid].tolist())]
+    mask = pd.Series(False, index=text.index)
+    mask[valid] = exact
+    return mask
+
+def infer_column_type(series):
+    """
+    Decides how a column is stored: text columns holding only numbers, booleans or
+    dates are converted, floats that are all whole numbers become integers, and
+    (with DICTIONARY_ENCODING) repeated short strings are moved to a lookup table.
+
+    Args:
+        series (pd.Series): The preprocessed column (from the first chunk it appears in).
+
+    Returns:
+        ColumnType: The storage decision.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return ColumnType("boolean", "INTEGER", None, None, None)
+    if pd.api.types.is_integer_dtype(series):
+        return ColumnType("integer", "INTEGER", None, None, None)
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if len(values) and (values % 1 == 0).all() and values.abs().max() < 2 ** 53:
+            return ColumnType("integer", "INTEGER", "float", None, None)  # Integers with gaps
+        return ColumnType("real", "REAL", None, None, None)
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+        return ColumnType("text", get_sqlite_dtype(series), None, None, None)
+
+    text = _text_values(series)
+    if text.empty:
+        return ColumnType("text", "TEXT", None, None, None)
+    # The whole column is only tested when its leading values pass
+    sample = text.iloc[:TYPE_SAMPLE_SIZE]
+    # A column of only "no" is more likely a country code than a boolean
+    if sample.str.lower().isin(BOOLEAN_STRINGS).all():
+        flags = text.str.lower().map(BOOLEAN_STRINGS)
+        if flags.notna().all() and flags.nunique() == 2:
+            return ColumnType("boolean", "INTEGER", "text", None, None)
+    # Numbers must print back as they were written, so "1.10" or "+5" stay text
+    if pd.to_numeric(sample, errors="coerce").notna().all():
+        numbers = pd.to_numeric(text, errors="coerce")
+        if (numbers.notna().all() and text.str.len().max() <= MAX_NUMBER_LENGTH
+                and not text.str.contains(_LEADING_ZERO).any()):
+            if _exact_numbers(text, numbers, "integer").all():
+                return ColumnType("integer", "INTEGER", "text", None, None)
+            if _exact_numbers(text, numbers, "real").all():
+                return ColumnType("real", "REAL", "text", None, None)
+    date_format = _date_format(text)
+    if date_format:
+        # Values the format doesn't fit are kept as text by convert_column
+        parsed = _parse_dates(text, date_format).dropna()
+        has_time = (parsed != parsed.dt.normalize()).any()
+        return ColumnType("datetime" if has_time else "date", "TEXT", "text", date_format, None)
+    if DICTIONARY_ENCODING:
+        distinct = text.nunique()
+        if distinct <= CATEGORY_MAX_VALUES and distinct <= CATEGORY_MAX_RATIO * len(text):
+            return ColumnType("category", "INTEGER", "text", None, {})
+    return ColumnType("text", "TEXT", None, None, None)
+
+def _merge(series, mask, values):
+    """
+    Builds an object column holding values where mask (a boolean array) is True and
+    the original values elsewhere, with None for missing values.
+    """
+    result = series.astype(object).where(series.notna(), None).to_numpy(copy=True)
+    result[mask] = values
+    return pd.Series(result, index=series.index, dtype=object)
+
+def convert_column(series, column_type):
+    """
+    Converts a column to its storage type. Values that don't fit the type (e.g. "n/a"
+    in a later chunk of a numeric column) are kept as they are; SQLite stores them
+    as text in the typed column.
+
+    Args:
+        series (pd.Series): The preprocessed column.
+        column_type (ColumnType): The decision from infer_column_type.
+
+    Returns:
+        pd.Series: The converted column (object dtype when converted, with None for NULL).
+    """
+    kind = column_type.kind
+    if kind in ("text", "real") and column_type.source is None:
+        return series
+    if kind == "integer" and pd.api.types.is_integer_dtype(series):
+        return series
+    if kind == "boolean" and pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series) and kind in ("integer", "real"):
+        numbers = series
+    elif series.dtype == object or pd.api.types.is_string_dtype(series):
+        text = _text_values(series)
+        if kind == "boolean":
+            flags = text.str.lower().map(BOOLEAN_STRINGS).dropna()
+            return _merge(series, series.index.isin(flags.index), flags.astype(int).tolist())
+        if kind in ("date", "datetime"):
+            parsed = _parse_dates(text, column_type.detail).dropna()
+            formatted = parsed.dt.strftime("%Y-%m-%d %H:%M:%S")
+            if kind == "date":
+                # A later chunk may bring times into a date column; those keep theirs
+                midnight = parsed == parsed.dt.normalize()
+                formatted.loc[midnight] = parsed[midnight].dt.strftime("%Y-%m-%d")
+            return _merge(series, series.index.isin(formatted.index), formatted.tolist())
+        if kind == "category":
+            codes = column_type.codes
+            for value in text.unique():
+                codes.setdefault(value, len(codes) + 1)
+            return _merge(series, series.index.isin(text.index), text.map(codes).tolist())
+        numbers = pd.to_numeric(text, errors="coerce")
+        numbers = numbers[_exact_numbers(text, numbers, kind)]
+    else:
+        return series
+    numbers = numbers.dropna()
+    # Whole numbers are written as Python ints, anything else as floats
+    values = [int(x) if x % 1 == 0 and abs(x) < 2 ** 53 else x for x in numbers.tolist()]
+    return _merge(series, series.index.isin(numbers.index), values)
+
+def lookup_table_name(table_name, column):
+    """
+    Names the lookup table of a dictionary-encoded column.
+    """
+    return re.sub(r"\W+", "_", f"{table_name}_{column}_values")
+
+def describe_column_type(column_type, lookup=None):
+    """
+    Describes a storage decision for the CREATE TABLE statement (and so for the schema
+    summary), or returns None when the column was stored as parsed. `lookup` is the
+    lookup table of a dictionary-encoded column.
+    """
+    kind, source = column_type.kind, column_type.source
+    if kind == "boolean":
+        return "boolean stored as 1/0" + (" (converted from text)" if source else "")
+    if kind == "date":
+        return "date as YYYY-MM-DD text (YYYY-MM-DD HH:MM:SS for the odd value with a time)"
+    if kind == "datetime":
+        return "date and time as YYYY-MM-DD HH:MM:SS text (UTC for zoned values)"
+    if kind == "category":
+        return f'code; the text is in "{lookup}"(id, value)'
+    if source:
+        return f"{'integer' if kind == 'integer' else 'number'} (converted from {source})"
+    return None
+
+def apply_column_types(df, column_types):
+    """
+    Converts a chunk's columns, inferring the type of columns seen for the first time.
+
+    Args:
+        df (pd.DataFrame): The preprocessed chunk.
+        column_types (dict): Column names mapped to ColumnType; updated in place.
+
+    Returns:
+        pd.DataFrame: The converted chunk.
+    """
+    for col in df.columns:
+        if col not in column_types:
+            column_types[col] = infer_column_type(df[col])
+        df[col] = convert_column(df[col], column_types[col])
     return df
 
+def write_lookup_tables(conn, table_name, column_types):
+    """
+    Creates the lookup tables of dictionary-encoded columns and adds their new values.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        table_name (str): The table being loaded.
+        column_types (dict): Column names mapped to ColumnType.
+    """
+    # list() copies: with prefetching, later chunks may be converted concurrently
+    for col, column_type in list(column_types.items()):
+        if column_type.kind != "category":
+            continue
+        lookup = quote_identifier(lookup_table_name(table_name, col))
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {lookup} (id INTEGER PRIMARY KEY, value TEXT UNIQUE)")
+        conn.executemany(f"INSERT OR IGNORE INTO {lookup} (id, value) VALUES (?, ?)",
+                         [(code, value) for value, code in list(column_type.codes.items())])
+
 #### Map Data Types to SQLite
 def get_sqlite_dtype(series):
     """
@@ -144,12 +819,14 @@ def get_sqlite_dtype(series):
         return "TEXT"  # Default for strings and other types
 
 #### Generate Unique Table Name
-def generate_table_name(df):
+def generate_table_name(df, conn=None):
     """
     Generates a unique table name based on a timestamp and generic prefix.
 
     Args:
         df (pd.DataFrame): The DataFrame to base the name on.
+        conn (sqlite3.Connection, optional): When given, a numeric suffix is added if a
+            table of that name exists (e.g. several loads within the same second).
 
     Returns:
         str: A unique table name.
@@ -159,38 +836,209 @@ def generate_table_name(df):
     prefix = "data"
     if any(col.lower() in df.columns for col in ["name", "title"]):
         prefix = "records"
-    return f"{prefix}_{timestamp}"
+    name = f"{prefix}_{timestamp}"
+    if conn is not None:
+        suffix = 1
+        while conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone():
+            suffix += 1
+            name = f"{prefix}_{timestamp}_{suffix}"
+    return name
 
-#### Main Function to Load Data
-def load_file_from_url(url, token=None):
+#### Bulk SQLite Writer
+def quote_identifier(name):
     """
-    Loads data from a URL and stores it in a SQLite database.
+    Quotes a table or column name for use in SQLite statements.
+
+    Args:
+        name: The identifier to quote.
+
+    Returns:
+        str: The double-quoted identifier.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def apply_ingest_pragmas(conn, pragmas=INGEST_PRAGMAS):
+    """
+    Applies ingest-time PRAGMAs to a connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection to tune (must not be in a transaction).
+        pragmas (dict, optional): PRAGMA names mapped to the values to set.
+
+    Returns:
+        dict: The previous PRAGMA values, to be passed to restore_pragmas.
+    """
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+def restore_pragmas(conn, previous):
+    """
+    Restores PRAGMA values saved by apply_ingest_pragmas. The load has already been
+    committed by then, so a PRAGMA that can't be restored only prints a warning.
+
+    Args:
+        conn (sqlite3.Connection): The connection to restore (must not be in a transaction).
+        previous (dict): PRAGMA names mapped to their previous values.
+    """
+    for name, value in previous.items():
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error as e:
+            print(f"Warning: could not restore PRAGMA {name} after a load: {e}")
+
+def drop_loaded_table(conn, table_name, column_types):
+    """
+    Drops a table written by an unfinished or unchanged load, with its lookup tables.
+    """
+    for col, column_type in list(column_types.items()):
+        if column_type.kind == "category":
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(lookup_table_name(table_name, col))}")
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+
+def create_table(conn, table_name, dtype_mapping, notes=None):
+    """
+    Creates a table from a column -> SQLite type mapping (see get_sqlite_dtype).
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        table_name (str): The table to create; it must not exist yet.
+        dtype_mapping (dict): Column names mapped to SQLite types.
+        notes (dict, optional): Column names mapped to a short description, written as
+            SQL comments that SQLite keeps in the stored CREATE TABLE statement.
+    """
+    notes = notes or {}
+    lines = []
+    for i, (col, dtype) in enumerate(dtype_mapping.items()):
+        line = f"    {quote_identifier(col)} {dtype}" + ("," if i < len(dtype_mapping) - 1 else "")
+        if notes.get(col):
+            line += f" -- {notes[col]}"
+        lines.append(line)
+    conn.execute(f"CREATE TABLE {quote_identifier(table_name)} (\n" + "\n".join(lines) + "\n)")
+
+@tracing.traced("ingest", "write")
+def insert_rows(conn, table_name, df, batch_size=BATCH_SIZE):
+    """
+    Inserts a DataFrame's rows into an existing table with executemany batches.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        table_name (str): The target table.
+        df (pd.DataFrame): The preprocessed rows to insert.
+        batch_size (int, optional): Rows bound per executemany call.
+    """
+    placeholders = ", ".join("?" * len(df.columns))
+    columns = ", ".join(quote_identifier(col) for col in df.columns)
+    sql = f"INSERT INTO {quote_identifier(table_name)} ({columns}) VALUES ({placeholders})"
+    # Series.tolist() yields native Python values that sqlite3 can bind directly
+    rows = list(zip(*(df[col].tolist() for col in df.columns)))
+    for offset in range(0, len(rows), batch_size):
+        conn.executemany(sql, rows[offset:offset + batch_size])
+
+def align_columns(conn, table_name, df, dtype_mapping, column_types=None):
+    """
+    Aligns a later chunk with the table created from the first one. Columns that only
+    appear now (e.g. keys first seen deep into a JSON array) are added to the table,
+    and columns the chunk lacks are filled with NULL.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        table_name (str): The target table.
+        df (pd.DataFrame): The preprocessed chunk.
+        dtype_mapping (dict): The table's columns mapped to SQLite types; updated in place.
+        column_types (dict, optional): Column names mapped to ColumnType (see
+            apply_column_types), used for the types of new columns.
+
+    Returns:
+        pd.DataFrame: The chunk with the table's columns, in table order.
+    """
+    for col in df.columns:
+        if col not in dtype_mapping:
+            if column_types and col in column_types:
+                dtype_mapping[col] = column_types[col].sqlite_type
+            else:
+                dtype_mapping[col] = get_sqlite_dtype(df[col])
+            conn.execute(f"ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(col)} {dtype_mapping[col]}")
+    if list(df.columns) == list(dtype_mapping):
+        return df
+    df = df.reindex(columns=list(dtype_mapping))
+    return df.astype(object).where(df.notna(), None)
+
+#### Fetch and Parse Data
+def read_chunks(url, token=None, chunk_size=CHUNK_SIZE):
+    """
+    Fetches a URL and parses its body into DataFrame chunks, picking the parser from
+    the Content-Type (and the body itself for mislabeled JSON).
 
     Args:
         url (str): The URL to fetch data from.
         token (str, optional): OAuth token for authentication.
+        chunk_size (int, optional): Rows (or records) per chunk when streaming. Pass None or 0
+            to buffer the whole body before parsing.
 
     Returns:
-        str: A success message with the table name or an error message.
+        iterable: The DataFrame chunks. When streaming, the body is downloaded and parsed
+            as the chunks are consumed, so parse errors surface while iterating.
+
+    Raises:
+        Exception: If the request fails or a buffered body can't be parsed.
     """
     # Step 1: Fetch data
-    try:
-        response = fetch_data(url, token)
-    except Exception as e:
-        return f"Error: {e}"
-
+    response = fetch_data(url, token, stream=bool(chunk_size))
     # Step 2: Determine data format and parse
+    return parse_response(response, chunk_size)
+
+def parse_response(response, chunk_size=CHUNK_SIZE, hasher=None):
+    """
+    Parses a fetched response into DataFrame chunks (see read_chunks).
+
+    Args:
+        response (requests.Response): The response, fetched with stream=bool(chunk_size).
+        chunk_size (int, optional): Rows (or records) per chunk when streaming, or None/0.
+        hasher (optional): A hashlib object updated with the body as it is read; a
+            streamed body is only hashed completely once the chunks are consumed.
+
+    Returns:
+        iterable: The DataFrame chunks.
+
+    Raises:
+        Exception: If a buffered body can't be parsed.
+    """
     content_type = response.headers.get('Content-Type', '').lower()
-    if 'application/json' in content_type:
+    if chunk_size:
+        head, stream = open_stream(response, hasher)
+        if any(t in content_type for t in NDJSON_CONTENT_TYPES):
+            chunks = process_json_stream(iter_ndjson_records(stream), chunk_size, "NDJSON")
+        elif 'application/json' in content_type:
+            chunks = process_json_stream(iter_json_records(stream), chunk_size)
+        elif 'text/csv' not in content_type and head.lstrip()[:1] in ('[', '{'):
+            # Mislabeled JSON / NDJSON bodies are still parsed as JSON
+            if looks_like_ndjson(head):
+                chunks = process_json_stream(iter_ndjson_records(stream), chunk_size, "NDJSON")
+            else:
+                chunks = process_json_stream(iter_json_records(stream), chunk_size)
+        else:
+            chunks = process_csv_stream(stream, head, chunk_size)
+        return chunks
+    if hasher is not None:
+        hasher.update(response.content)
+    if any(t in content_type for t in NDJSON_CONTENT_TYPES):
+        try:
+            df = process_ndjson(response)
+        except Exception as e:
+            raise Exception(f"Failed to parse NDJSON: {e}")
+    elif 'application/json' in content_type:
         try:
             df = process_json(response)
         except Exception as e:
-            return f"Error: Failed to parse JSON: {e}"
+            raise Exception(f"Failed to parse JSON: {e}")
     elif 'text/csv' in content_type:
         try:
             df = process_csv(response)
         except Exception as e:
-            return f"Error: Failed to parse CSV: {e}"
+            raise Exception(f"Failed to parse CSV: {e}")
     else:
         # Fallback for mislabeled content types
         try:
@@ -199,24 +1047,526 @@ def load_file_from_url(url, token=None):
             try:
                 df = process_csv(response)
             except Exception as e:
-                return f"Error: Failed to parse data (tried JSON and CSV): {e}"
+                raise Exception(f"Failed to parse data (tried JSON and CSV): {e}")
 
-    # Step 3: Preprocess the DataFrame
-    df = preprocess_dataframe(df)
+    return [df]
 
-    # Step 4: Generate table name
-    table_name = generate_table_name(df)
+#### Refresh Known Sources
+_source_tokens = {}         # url -> OAuth token, kept in memory only for scheduled refreshes
 
-    # Step 5: Map data types
-    dtype_mapping = {col: get_sqlite_dtype(df[col]) for col in df.columns}
+def merge_table(conn, staging, target, mode, key_column=None):
+    """
+    Moves freshly loaded rows from a staging table into an existing table and drops
+    the staging table. Runs inside the load's transaction.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        staging (str): The table the new rows were loaded into.
+        target (str): The existing table to update.
+        mode (str): "replace" swaps the target for the staging table (the target's
+            indexes are recreated where their columns still exist), "append" inserts
+            the new rows, and "upsert" first deletes the target rows whose key_column
+            value appears in the new rows. Appends add columns the target lacks.
+        key_column (str, optional): The column identifying a row, for "upsert".
+
+    Raises:
+        ValueError: If the upsert key column is not in the new rows.
+    """
+    q_staging, q_target = quote_identifier(staging), quote_identifier(target)
+    if mode == "replace":
+        indexes = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (target,))]
+        conn.execute(f"DROP TABLE {q_target}")
+        conn.execute(f"ALTER TABLE {q_staging} RENAME TO {q_target}")
+        for sql in indexes:
+            try:
+                conn.execute(sql)
+            except sqlite3.OperationalError:
+                pass  # The indexed column is gone from the new data
+        return
+    target_columns = {row[1] for row in conn.execute("SELECT * FROM pragma_table_info(?)", (target,))}
+    staging_columns = [(row[1], row[2]) for row in conn.execute("SELECT * FROM pragma_table_info(?)", (staging,))]
+    for col, dtype in staging_columns:
+        if col not in target_columns:
+            conn.execute(f"ALTER TABLE {q_target} ADD COLUMN {quote_identifier(col)} {dtype}")
+    if mode == "upsert":
+        if key_column not in {col for col, _ in staging_columns}:
+            raise ValueError(f"Key column '{key_column}' is not in the data")
+        key = quote_identifier(key_column)
+        conn.execute(f"DELETE FROM {q_target} WHERE {key} IN (SELECT {key} FROM {q_staging})")
+    columns = ", ".join(quote_identifier(col) for col, _ in staging_columns)
+    conn.execute(f"INSERT INTO {q_target} ({columns}) SELECT {columns} FROM {q_staging}")
+    conn.execute(f"DROP TABLE {q_staging}")
+
+class SourceLoad:
+    """
+    One load of a URL, tracked in the source registry. A URL loaded before is fetched
+    with a conditional GET (its ETag / Last-Modified), and new data is written into
+    its existing table (see merge_table) instead of a new one. A body whose SHA256
+    matches the last load is treated as unchanged too, for servers without validators.
+    """
+    def __init__(self, url, token=None, mode=None, key_column=None, refresh_interval=None, force=False):
+        """
+        Args:
+            url (str): The URL to load.
+            token (str, optional): OAuth token; remembered in memory for later refreshes.
+            mode (str, optional): "replace", "append" or "upsert"; defaults to the registered
+                mode, then DEFAULT_REFRESH_MODE.
+            key_column (str, optional): The column identifying a row, for "upsert".
+            refresh_interval (float, optional): Seconds between scheduled refreshes (0 turns
+                them off); defaults to the registered interval.
+            force (bool, optional): Download and rewrite the data even if it is unchanged.
+
+        Raises:
+            ValueError: If the mode is unknown or "upsert" has no key column.
+        """
+        known = source_registry.get_source(SOURCES_DB_PATH, url)
+        self.url = url
+        if token:
+            _source_tokens[url] = token
+        self.token = token or _source_tokens.get(url)
+        self.mode = mode or (known.mode if known else DEFAULT_REFRESH_MODE)
+        self.key_column = key_column or (known.key_column if known else None)
+        if refresh_interval is None:
+            refresh_interval = known.refresh_interval if known else None
+        self.refresh_interval = refresh_interval or None
+        self.force = force
+        if self.mode not in source_registry.REFRESH_MODES:
+            raise ValueError(f"Unknown refresh mode '{self.mode}' (use {', '.join(source_registry.REFRESH_MODES)})")
+        if self.mode == "upsert" and not self.key_column:
+            raise ValueError("The upsert mode needs a key column")
+        # Refresh in place only while the table still exists. Dictionary-encoded columns
+        # hold codes into lookup tables of their own load, so those loads get a new table.
+        self.source = None
+        if known is not None and not DICTIONARY_ENCODING:
+            with get_pool(DB_PATH).connection() as conn:
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                (known.table_name,)).fetchone():
+                    self.source = known
+        self.hasher = hashlib.sha256()
+        self.response = None
+        self.table_name = None
+
+    def open(self, chunk_size=CHUNK_SIZE):
+        """
+        Fetches the URL, conditionally if it was loaded before.
+
+        Returns:
+            iterable: The DataFrame chunks (see parse_response), or None if the server
+                answered 304 Not Modified.
+        """
+        headers = {}
+        if self.source is not None and not self.force:
+            if self.source.etag:
+                headers["If-None-Match"] = self.source.etag
+            if self.source.last_modified:
+                headers["If-Modified-Since"] = self.source.last_modified
+        self.response = fetch_data(self.url, self.token, stream=bool(chunk_size), headers=headers)
+        if self.response.status_code == 304:
+            self.response.close()
+            return None
+        return parse_response(self.response, chunk_size, self.hasher)
+
+    def finish(self, conn, table_name):
+        """
+        The store_chunks hook: keeps a new URL's table, or merges the rows into the
+        URL's existing table. Returns None if the body is the same as last time.
+        """
+        # Parsers may stop before the end of the body (e.g. a JSON array's closing bracket)
+        for block in iter(lambda: self.response.raw.read(SNIFF_BYTES), b""):
+            self.hasher.update(block)
+        if self.source is None:
+            self.table_name = table_name
+        elif not self.force and self.hasher.hexdigest() == self.source.content_hash:
+            return None
+        else:
+            merge_table(conn, table_name, self.source.table_name, self.mode, self.key_column)
+            self.table_name = self.source.table_name
+        return self.table_name
+
+    def record(self, result):
+        """
+        Updates the registry after the load and returns the message to show for it.
+        """
+        now = time.time()
+        if result == UNCHANGED_RESULT:
+            source_registry.save_source(SOURCES_DB_PATH, self.source._replace(
+                mode=self.mode, key_column=self.key_column, refresh_interval=self.refresh_interval, checked_at=now))
+            return f"Unchanged: the data at {self.url} is the same as in the last load (table '{self.source.table_name}')."
+        if not result.startswith("Success"):
+            return result
+        headers = self.response.headers
+        source_registry.save_source(SOURCES_DB_PATH, source_registry.Source(
+            self.url, self.table_name, headers.get("ETag"), headers.get("Last-Modified"), self.hasher.hexdigest(),
+            self.mode, self.key_column, self.refresh_interval, now, now))
+        if self.source is not None:
+            result += f" Refreshed in place ({self.mode})."
+        return result
+
+def refresh_sources(urls=None, force=False, on_update=None):
+    """
+    Re-checks registered URLs and writes the changed ones into their tables with
+    their registered mode.
+
+    Args:
+        urls (list, optional): The URLs to check; defaults to every registered URL.
+        force (bool, optional): Rewrite the data even if it is unchanged.
+        on_update (callable, optional): Passed on to load_files_from_urls.
+
+    Returns:
+        list: The statuses from load_files_from_urls.
+    """
+    if urls is None:
+        urls = [source.url for source in source_registry.list_sources(SOURCES_DB_PATH)]
+    if not urls:
+        return []
+    return load_files_from_urls([{"url": url, "force": force} for url in urls], on_update=on_update)
+
+def refresh_due_sources():
+    """
+    Refreshes the registered URLs whose refresh_interval has passed since their last check.
+    """
+    return refresh_sources([source.url for source in source_registry.due_sources(SOURCES_DB_PATH)])
+
+#### Main Function to Load Data
+def load_file_from_url(url, token=None, chunk_size=CHUNK_SIZE, writer="bulk", infer_types=INFER_TYPES,
+                       mode=None, key_column=None, refresh_interval=None, force=False):
+    """
+    Loads data from a URL and stores it in a SQLite database.
+
+    CSV, JSON and NDJSON bodies are streamed and written chunk by chunk so peak
+    memory is bounded by chunk_size rather than the file size. A URL loaded before
+    is refreshed in its existing table (see SourceLoad), or left alone if unchanged.
+
+    Args:
+        url (str): The URL to fetch data from.
+        token (str, optional): OAuth token for authentication.
+        chunk_size (int, optional): Rows (or records) per chunk when streaming. Pass None or 0
+            to buffer the whole body before parsing.
+        writer (str, optional): "bulk" for the executemany writer (see store_chunks),
+            or "to_sql" for the pandas writer.
+        infer_types (bool, optional): Store numbers, booleans and dates found in text
+            columns as typed values (see infer_column_type).
+        mode, key_column, refresh_interval, force: How a known URL is refreshed (see SourceLoad).
+
+    Returns:
+        str: A success message with the table name, an "Unchanged" message or an error message.
+    """
+    start = time.perf_counter()
+    # Each step is timed as a stage of the "ingest" pipeline (see tracing.py, served at /metrics)
+    with tracing.trace_request("ingest"):
+        # Steps 1-2: Fetch data, determine its format and parse it
+        try:
+            source = SourceLoad(url, token, mode, key_column, refresh_interval, force)
+            chunks = source.open(chunk_size)
+        except Exception as e:
+            return f"Error: {e}"
+        if chunks is None:
+            return source.record(UNCHANGED_RESULT)
+        return source.record(store_chunks(chunks, start, writer, infer_types, finish=source.finish))
+
+#### Store DataFrame Chunks
+def prepare_chunks(chunks, column_types, infer_types=INFER_TYPES):
+    """
+    Preprocesses each DataFrame chunk and, with infer_types, converts its columns.
+
+    Args:
+        chunks (iterable): The parsed DataFrames.
+        column_types (dict): Column names mapped to ColumnType; filled in as columns appear.
+        infer_types (bool, optional): Convert text columns holding numbers, booleans or dates.
+
+    Yields:
+        pd.DataFrame: The non-empty chunks, ready to be written.
+    """
+    # Streamed bodies are downloaded while the chunks are parsed, so "parse" includes the download
+    for df in tracing.timed_iter("ingest", "parse", chunks):
+        # A header-only CSV parses into one empty chunk; it must not create a table
+        if df.empty:
+            continue
+        # Step 3: Preprocess the DataFrame
+        with tracing.stage("ingest", "preprocess"):
+            df = preprocess_dataframe(df)
+        if infer_types:
+            with tracing.stage("ingest", "convert_types"):
+                df = apply_column_types(df, column_types)
+        yield df
+
+def store_chunks(chunks, start, writer="bulk", infer_types=INFER_TYPES, column_types=None, finish=None,
+                 timings=None):
+    """
+    Preprocesses each DataFrame chunk and appends it to a newly created SQLite table.
+
+    Column types are decided on the first chunk a column appears in (see
+    infer_column_type) and later chunks are converted the same way. Converted
+    columns are described with comments in the CREATE TABLE statement, so the
+    schema summary knows e.g. that a date column holds YYYY-MM-DD text.
+
+    The "bulk" writer creates the table from the inferred types and inserts
+    every chunk with executemany, under INGEST_PRAGMAS. Each chunk is written in a
+    transaction of its own while holding the database's writer lock (SQLite has a
+    single writer), so other loads and index builds only wait for one chunk, never
+    for a download. The table fills up as chunks arrive; a failed load drops it again.
+
+    Args:
+        chunks (iterable): DataFrames to store; the first one defines the table.
+        start (float): time.perf_counter() value when the load started, for throughput.
+        writer (str, optional): "bulk" or "to_sql".
+        infer_types (bool, optional): Convert text columns holding numbers, booleans or dates.
+        column_types (dict, optional): Pass the dict given to prepare_chunks when the
+            chunks were already prepared (e.g. ahead of the writer, see load_files_from_urls).
+        finish (callable, optional): Called as finish(conn, table_name) after the last chunk,
+            in one transaction. Returns the table that holds the rows in the end
+            (SourceLoad.finish moves them into an existing table), or None to drop the
+            loaded table as unchanged. Only the bulk writer makes this atomic: pandas
+            commits by itself.
+        timings (dict, optional): Accumulates the seconds spent waiting for ("wait") and
+            holding ("write") the writer lock.
+
+    Returns:
+        str: A success message with the table name, row count, rows/sec and converted
+            columns, or an error message.
+    """
+    table_name = loaded = None
+    finished = False
+    rows = 0
+    if column_types is None:
+        column_types = {}
+        chunks = prepare_chunks(chunks, column_types, infer_types)
+    timings = {"wait": 0.0, "write": 0.0} if timings is None else timings
+    bulk = writer == "bulk"
+
+    @contextmanager
+    def writing(conn):
+        # The writer lock and a transaction are only held while a chunk is written, not
+        # while the next one downloads, so a slow URL doesn't hold up other writers
+        waiting = time.perf_counter()
+        with writer_lock(DB_PATH):
+            held = time.perf_counter()
+            timings["wait"] += held - waiting
+            try:
+                if bulk:
+                    conn.execute("BEGIN")
+                yield
+                with tracing.stage("ingest", "commit"):
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                timings["write"] += time.perf_counter() - held
 
-    # Step 6: Store in SQLite
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            df.to_sql(table_name, conn, index=False, if_exists='fail', dtype=dtype_mapping)
-        return f"Success: Data stored in table '{table_name}'."
+        with get_pool(DB_PATH).connection() as conn:
+            with writer_lock(DB_PATH):
+                bootstrap(DB_PATH, DB_SETUP)
+            # The bulk writer manages its own transactions, so switch the pooled
+            # connection to autocommit for the duration of the load.
+            isolation_level = conn.isolation_level
+            if bulk:
+                conn.isolation_level = None
+            previous = apply_ingest_pragmas(conn) if bulk else {}
+            try:
+                # Step 3 (preprocessing and type conversion) happens in prepare_chunks
+                for df in chunks:
+                    with writing(conn):
+                        if loaded is None:
+                            # Step 4: Generate table name
+                            loaded = generate_table_name(df, conn)
+                            # Step 5: Map data types
+                            if infer_types:
+                                dtype_mapping = {col: column_types[col].sqlite_type for col in df.columns}
+                            else:
+                                dtype_mapping = {col: get_sqlite_dtype(df[col]) for col in df.columns}
+                            # Step 6: Store in SQLite
+                            if bulk:
+                                notes = {col: describe_column_type(column_types[col], lookup_table_name(loaded, col))
+                                         for col in df.columns if col in column_types}
+                                create_table(conn, loaded, dtype_mapping, notes)
+                            else:
+                                with tracing.stage("ingest", "write"):
+                                    df.to_sql(loaded, conn, index=False, if_exists='fail', dtype=dtype_mapping)
+                        else:
+                            df = align_columns(conn, loaded, df, dtype_mapping, column_types)
+                            if not bulk:
+                                with tracing.stage("ingest", "write"):
+                                    df.to_sql(loaded, conn, index=False, if_exists='append')
+                        if bulk:
+                            insert_rows(conn, loaded, df)
+                        write_lookup_tables(conn, loaded, column_types)
+                    rows += len(df)
+                if loaded is not None:
+                    with writing(conn):
+                        table_name = loaded
+                        if finish is not None:
+                            with tracing.stage("ingest", "finish"):
+                                table_name = finish(conn, loaded)
+                        if table_name is None:
+                            drop_loaded_table(conn, loaded, column_types)
+                    finished = True
+            except Exception:
+                # Chunks are committed as they arrive, so a failed load drops what it wrote
+                if loaded is not None and not finished:
+                    with writing(conn):
+                        drop_loaded_table(conn, loaded, column_types)
+                raise
+            finally:
+                try:
+                    restore_pragmas(conn, previous)
+                finally:
+                    conn.isolation_level = isolation_level
     except sqlite3.Error as e:
         return f"Error: Failed to store data in SQLite: {e}"
+    except Exception as e:
+        return f"Error: {e}"
+    finally:
+        schema_catalog.invalidate(DB_PATH)
+
+    if table_name is None and rows:
+        return UNCHANGED_RESULT
+    if table_name is None or rows == 0:
+        return "Error: No tabular data found in response"
+    try:
+        with tracing.stage("ingest", "index_table"):
+            table_index.index_table(DB_PATH, table_name)
+    except sqlite3.Error:
+        pass  # The agent indexes any table it finds missing
+
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else float(rows)
+    message = f"Success: Data stored in table '{table_name}' ({rows} rows, {rate:,.0f} rows/sec)."
+    converted = [f"{col} as {column_type.kind}" for col, column_type in column_types.items()
+                 if column_type.source or column_type.kind in ("date", "datetime", "category")]
+    if converted:
+        message += " Converted columns: " + ", ".join(converted) + "."
+    return message
+
+#### Batch Loading
+_PREFETCH_DONE = object()
+
+def prefetch(chunks, depth=PREFETCH_CHUNKS):
+    """
+    Iterates chunks on a background thread, keeping up to `depth` of them ready, so a
+    URL keeps downloading and parsing while its load waits for the writer.
+
+    Args:
+        chunks (iterable): The DataFrame chunks (see read_chunks).
+        depth (int, optional): Chunks parsed ahead of the consumer.
+
+    Returns:
+        iterator: The chunks in order; a parse error is raised where it occurred.
+    """
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for df in chunks:
+                while not stop.is_set():
+                    try:
+                        ready.put(df, timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+            item = _PREFETCH_DONE
+        except Exception as e:
+            item = e
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def consume():
+        try:
+            while True:
+                item = ready.get()
+                if item is _PREFETCH_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()  # e.g. the load failed; let the producer exit
+
+    # Started here rather than on first iteration, so parsing begins right away
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    return consume()
+
+def load_files_from_urls(sources, chunk_size=CHUNK_SIZE, workers=BATCH_WORKERS, on_update=None, **options):
+    """
+    Loads several URLs, each into its own table. Up to `workers` URLs are downloaded
+    and parsed at once, and each keeps parsing and converting ahead (see prefetch)
+    while the single writer stores another one's chunk. Downloads from the same host
+    share a session.
+
+    Args:
+        sources (list): URLs, or dicts with "url" and optional "token", "mode", "key_column",
+            "refresh_interval" and "force" (see SourceLoad).
+        chunk_size (int, optional): Rows (or records) per chunk, as in load_file_from_url.
+        workers (int, optional): URLs processed concurrently.
+        on_update (callable, optional): Called with a copy of the statuses whenever one changes.
+        **options: writer / infer_types, passed on to store_chunks.
+
+    Returns:
+        list: One status dict per source, in order, with "url", "status" ("done" or
+            "failed"), "result" (the load_file_from_url message) and timings in seconds:
+            "wait_seconds" (waiting for the writer), "write_seconds" (holding it), summed
+            over the load's chunks, and
+            "total_seconds".
+    """
+    sources = [{"url": source} if isinstance(source, str) else dict(source) for source in sources]
+    statuses = [{"url": source["url"], "status": "queued", "result": None,
+                 "wait_seconds": None, "write_seconds": None, "total_seconds": None} for source in sources]
+    lock = threading.Lock()
+
+    def update(i, **fields):
+        with lock:
+            statuses[i].update(fields)
+            snapshot = [dict(status) for status in statuses]
+        if on_update:
+            on_update(snapshot)
+
+    def load(i):
+        with tracing.trace_request("ingest"):
+            load_source(i)
+
+    def load_source(i):
+        source = sources[i]
+        start = time.perf_counter()
+        update(i, status="downloading")
+        # Preprocessing and type conversion run in the prefetch thread too, off the writer
+        column_types = {}
+        infer_types = options.get("infer_types", INFER_TYPES)
+        wait = write = None
+        try:
+            source_load = SourceLoad(source["url"], source.get("token"), source.get("mode"), source.get("key_column"),
+                                     source.get("refresh_interval"), source.get("force", False))
+            chunks = source_load.open(chunk_size)
+            if chunks is not None:
+                chunks = prefetch(prepare_chunks(chunks, column_types, infer_types))
+        except Exception as e:
+            result = f"Error: {e}"
+        else:
+            if chunks is None:
+                result = source_load.record(UNCHANGED_RESULT)
+            else:
+                update(i, status="writing")
+                timings = {"wait": 0.0, "write": 0.0}
+                result = source_load.record(store_chunks(chunks, start, column_types=column_types,
+                                                         finish=source_load.finish, timings=timings, **options))
+                wait, write = timings["wait"], timings["write"]
+                if tracing.TRACING:
+                    tracing.observe("ingest", "writer_wait", wait)
+        update(i, status="failed" if result.startswith("Error") else "done", result=result,
+               wait_seconds=wait and round(wait, 3), write_seconds=write and round(write, 3),
+               total_seconds=round(time.perf_counter() - start, 3))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources))), thread_name_prefix="batch") as pool:
+        list(pool.map(load, range(len(sources))))
+    return statuses
 
 ### Execution
 if __name__ == "__main__":
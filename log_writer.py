@@ -0,0 +1,166 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from db_pool import get_pool, resolve_uri
+
+# --- Configuration ---
+LOG_QUEUE_SIZE = 10000       # Queued interactions before producers are slowed down
+LOG_BATCH_SIZE = 200         # Interactions written per transaction at most
+LOG_FLUSH_INTERVAL = 0.5     # Seconds a queued interaction waits for others to share its transaction
+LOG_PUT_TIMEOUT = 0.05       # Seconds a producer waits on a full queue before its interaction is dropped
+LOG_SHUTDOWN_TIMEOUT = 10    # Seconds the flush at interpreter exit may take
+
+INSERT_LOG = """
+    INSERT INTO memory_logs (timestamp, user_query, sql_query, sql_result, final_answer)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+# --- Log Writer ---
+class LogWriter:
+    """
+    Writes memory_logs rows on a background thread. log() only queues a row; the
+    thread writes what is queued in one transaction per LOG_BATCH_SIZE rows or per
+    LOG_FLUSH_INTERVAL, whichever comes first, so a request pays no disk I/O for
+    logging and concurrent requests don't contend on memory.db's write lock.
+
+    When the queue is full, log() waits up to LOG_PUT_TIMEOUT (counted as "blocked")
+    and then drops the row (counted as "dropped"); see stats(). Queued rows are
+    flushed at interpreter exit.
+    """
+    def __init__(self, memory_db_path, init=None):
+        self.memory_db_path = memory_db_path
+        self._init = init  # Creates memory_logs, called before the first write
+        self._queue = queue.Queue(LOG_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._counters = {"queued": 0, "written": 0, "batches": 0, "blocked": 0, "dropped": 0, "failed": 0}
+        self._max_depth = 0
+        self._last_flush_ms = None
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def log(self, record) -> bool:
+        """
+        Queues one (timestamp, user_query, sql_query, sql_result, final_answer) row.
+        Returns False if it was dropped because the queue stayed full.
+        """
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("blocked")
+            try:
+                self._queue.put(record, timeout=LOG_PUT_TIMEOUT)
+            except queue.Full:
+                self._count("dropped")
+                return False
+        with self._lock:
+            self._counters["queued"] += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Waits until every row queued so far is written. Returns False on timeout.
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=LOG_SHUTDOWN_TIMEOUT):
+        """
+        Writes the queued rows and stops the thread.
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, queue_depth=self._queue.qsize(), max_queue_depth=self._max_depth,
+                        last_flush_ms=self._last_flush_ms)
+
+    def _run(self):
+        if not resolve_uri(self.memory_db_path)[1]:
+            # Readers (e.g. /history) don't block the writer, and the WAL is synced once per batch
+            with get_pool(self.memory_db_path).connection() as conn:
+                conn.execute("PRAGMA journal_mode = WAL")
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= LOG_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            if self._init is not None:
+                self._init(self.memory_db_path)
+            with get_pool(self.memory_db_path).connection() as conn:
+                conn.executemany(INSERT_LOG, batch)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Failed to write {len(batch)} log rows: {e}")
+            self._count("failed", len(batch))
+            return
+        with self._lock:
+            self._counters["written"] += len(batch)
+            self._counters["batches"] += 1
+            self._last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_log_writer(memory_db_path, init=None) -> LogWriter:
+    """
+    Returns the process-wide LogWriter of a memory database.
+    """
+    key = resolve_uri(memory_db_path)[0]
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = LogWriter(memory_db_path, init)
+        elif writer._init is None:
+            writer._init = init
+        return writer
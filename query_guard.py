@@ -0,0 +1,155 @@
+import re
+import threading
+import time
+
+import result_engine
+
+# --- Configuration ---
+QUERY_TIMEOUT = 15                 # Seconds a query may run (including fetching its rows)
+MAX_VM_STEPS = 2_000_000_000       # SQLite VM instructions a query may execute (None: QUERY_TIMEOUT alone).
+                                   # A GROUP BY takes ~17 per row, so QUERY_TIMEOUT binds first on normal aggregates
+PROGRESS_INTERVAL = 10_000         # Instructions between progress handler calls
+MAX_CARTESIAN_ROWS = 10_000_000    # Estimated row combinations allowed for full-scan joins
+RESULT_LIMIT = result_engine.MAX_SCAN_ROWS + 1  # LIMIT added to queries without one (one extra row
+                                                # so result_engine can tell the result was cut)
+
+# Results for queries stopped by a budget. They read differently from the SQL error
+# results so the final answer can tell the user why there is no data.
+TIME_BUDGET_RESULT = "Query budget exceeded: the query took longer than the time limit and was stopped."
+STEP_BUDGET_RESULT = "Query budget exceeded: the query needed too much computation and was stopped."
+CARTESIAN_RESULT = "Query budget exceeded: the query would combine every row of large tables with each other (a cross join) and was not run."
+BUDGET_RESULTS = {TIME_BUDGET_RESULT, STEP_BUDGET_RESULT, CARTESIAN_RESULT}
+
+# --- LIMIT Injection ---
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+\d+(\s*(,|OFFSET)\s*\d+)?$", re.IGNORECASE)
+# String literals and quoted names (kept), then comments (dropped)
+_COMMENT = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(--[^\n]*|/\*.*?(?:\*/|$))", re.DOTALL)
+
+def strip_comments(query: str) -> str:
+    return _COMMENT.sub(lambda match: " " if match.group(1) else match.group(0), query)
+
+def add_limit(query: str, limit=RESULT_LIMIT) -> str:
+    """
+    Appends a LIMIT to queries that don't end with one. Comments and trailing
+    semicolons are removed first, so neither can end up in front of the LIMIT.
+    """
+    query = re.sub(r"[\s;]+$", "", strip_comments(query).strip())
+    if _TRAILING_LIMIT.search(query):
+        return query
+    return f"{query}\nLIMIT {limit}"
+
+# --- Plan Pre-check ---
+_TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+("[^"]+"|\w+)(?:\s+(?:AS\s+)?("[^"]+"|\w+))?'
+                              r'|,\s*("[^"]+"|\w+)(?:\s+(?:AS\s+)?("[^"]+"|\w+))?', re.IGNORECASE)
+_NOT_ALIASES = {"select", "from", "on", "using", "where", "join", "inner", "left", "right", "full", "cross", "natural",
+                "group", "order", "limit", "having", "union", "except", "intersect", "window"}
+
+def unquote(name):
+    return name[1:-1] if name and name.startswith('"') else name
+
+def table_references(query: str, tables) -> dict:
+    """
+    Maps the tables a query reads from, by name and by alias (both lowercased), to
+    their table names.
+    """
+    lowered = {table.lower(): table for table in tables}
+    names = {}
+    for match in _TABLE_REFERENCE.finditer(query):
+        table, alias = unquote(match.group(1) or match.group(3)), unquote(match.group(2) or match.group(4))
+        if not table or table.lower() not in lowered:
+            continue
+        names[table.lower()] = lowered[table.lower()]
+        if alias and alias.lower() not in _NOT_ALIASES:
+            names[alias.lower()] = lowered[table.lower()]
+    return names
+
+def estimate_rows(conn, table: str) -> int:
+    """
+    Estimates a table's row count from its largest rowid (a B-tree lookup, not a scan).
+    """
+    try:
+        quoted = '"' + table.replace('"', '""') + '"'
+        return conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0
+    except Exception:
+        return 0  # e.g. WITHOUT ROWID tables
+
+def check_plan(conn, query: str):
+    """
+    Runs EXPLAIN QUERY PLAN and estimates the cost of nested full scans. Loops at the
+    same level of the plan are nested, so full scans of several large tables there
+    multiply; above MAX_CARTESIAN_ROWS combinations the query is rejected.
+    Returns CARTESIAN_RESULT for rejected queries, otherwise None.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    # EXPLAIN QUERY PLAN names a loop by its table's alias, or by the table name
+    names = {table.lower(): table for table in tables}
+    names.update(table_references(query, tables))
+    levels = {}
+    for _, parent, _, detail in plan:
+        if not detail.startswith("SCAN "):
+            continue
+        name = detail[len("SCAN "):].split(" USING ")[0].strip()
+        table = names.get(name.lower())
+        if table is not None:
+            levels.setdefault(parent, []).append(table)
+    for scanned in levels.values():
+        if len(scanned) < 2:
+            continue
+        combinations = 1
+        for table in scanned:
+            combinations *= max(estimate_rows(conn, table), 1)
+        if combinations > MAX_CARTESIAN_ROWS:
+            return CARTESIAN_RESULT
+    return None
+
+# --- Runtime Budget ---
+class QueryBudget:
+    """
+    Enforces the time and VM-step budgets on one connection while a query runs:
+
+        with QueryBudget(conn) as budget:
+            ...  # execute and fetch; a violation raises sqlite3.OperationalError
+        budget.violation  # TIME_BUDGET_RESULT / STEP_BUDGET_RESULT / None
+
+    The progress handler counts steps and checks the deadline between instructions.
+    A timer also calls conn.interrupt() at the deadline, since a single instruction
+    (such as sorting a large temp B-tree) can run for a long time.
+    """
+    def __init__(self, conn, timeout=QUERY_TIMEOUT, max_steps=MAX_VM_STEPS):
+        self.conn = conn
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.steps = 0
+        self.violation = None
+        self._deadline = None
+        self._timer = None
+
+    def _progress(self):
+        self.steps += PROGRESS_INTERVAL
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.violation = STEP_BUDGET_RESULT
+            return 1
+        if time.monotonic() > self._deadline:
+            self.violation = TIME_BUDGET_RESULT
+            return 1
+        return 0
+
+    def _expire(self):
+        self.violation = self.violation or TIME_BUDGET_RESULT
+        self.conn.interrupt()
+
+    def __enter__(self):
+        self._deadline = time.monotonic() + self.timeout
+        self.conn.set_progress_handler(self._progress, PROGRESS_INTERVAL)
+        self._timer = threading.Timer(self.timeout, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._timer.cancel()
+        self.conn.set_progress_handler(None, 0)  # Pooled connections are reused
+        if exc_type is None:
+            self.violation = None  # The timer may have fired just after the query finished
+        return False
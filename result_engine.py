@@ -0,0 +1,160 @@
+from collections import namedtuple
+
+# --- Configuration ---
+FETCH_SIZE = 500              # Rows pulled from the cursor per fetchmany call
+MAX_ROWS = 200                # Rows kept verbatim for the prompt
+MAX_BYTES = 64 * 1024         # Approximate size cap on the rows kept verbatim
+MAX_SCAN_ROWS = 100000        # Rows read in total (for counts and summaries) before stopping
+TOP_VALUES = 5                # Most frequent values reported per column
+TOP_TRACKED = 100             # Distinct values counted per column before it counts as high-cardinality
+RESULT_TOKENS = 1500          # Token budget of the rendering passed to the LLM
+MAX_CELL_CHARS = 200          # Longer cell values are cut in the rendering
+
+# columns: names from cursor.description
+# rows: the first rows of the result (bounded by MAX_ROWS / MAX_BYTES)
+# total_rows: rows read (stops at MAX_SCAN_ROWS)
+# complete: False if reading stopped at MAX_SCAN_ROWS before the end of the result
+# summaries: per-column ColumnSummary, only filled when rows were left out
+QueryResult = namedtuple("QueryResult", ["columns", "rows", "total_rows", "complete", "summaries"])
+
+# --- Column Summaries ---
+class ColumnSummary:
+    """
+    Streaming per-column statistics: non-null count, min/max (numeric and text kept
+    apart), numeric mean and value frequencies. Frequencies are only tracked while the
+    column has at most TOP_TRACKED distinct values, so memory stays constant.
+    """
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self._numeric = [None, None, 0.0, 0]   # min, max, sum, count
+        self._text = [None, None]              # min, max
+        self._counts = {}
+        self._high_cardinality = False
+
+    def add(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+        if isinstance(value, (int, float)):
+            stats = self._numeric
+            if stats[3] == 0 or value < stats[0]:
+                stats[0] = value
+            if stats[3] == 0 or value > stats[1]:
+                stats[1] = value
+            stats[2] += value
+            stats[3] += 1
+        else:
+            if isinstance(value, bytes):
+                value = f"<{len(value)} bytes>"
+            stats = self._text
+            if stats[0] is None or value < stats[0]:
+                stats[0] = value
+            if stats[1] is None or value > stats[1]:
+                stats[1] = value
+        if not self._high_cardinality:
+            counts = self._counts
+            if value in counts:
+                counts[value] += 1
+            elif len(counts) < TOP_TRACKED:
+                counts[value] = 1
+            else:
+                self._high_cardinality = True
+                counts.clear()
+
+    def describe(self) -> str:
+        parts = [f"{self.count} values"]
+        if self.nulls:
+            parts.append(f"{self.nulls} nulls")
+        low, high, total, numeric = self._numeric
+        if numeric:
+            parts.append(f"min {low}, max {high}, mean {total / numeric:.6g}")
+        if self._text[0] is not None:
+            parts.append(f"text min {_cell(self._text[0])}, max {_cell(self._text[1])}")
+        if self._high_cardinality:
+            parts.append(f"more than {TOP_TRACKED} distinct values")
+        elif self._counts:
+            top = sorted(self._counts.items(), key=lambda item: -item[1])[:TOP_VALUES]
+            parts.append(f"{len(self._counts)} distinct; top: " + ", ".join(f"{_cell(value)} ({count})" for value, count in top))
+        return "; ".join(parts)
+
+# --- Result Collection ---
+def collect(cursor) -> QueryResult:
+    """
+    Reads an executed cursor with fetchmany, keeping only the first rows verbatim and
+    summarizing every column when the result is larger than that. Memory is bounded
+    by MAX_ROWS/MAX_BYTES and the per-column sketches, regardless of the query.
+    """
+    columns = [column[0] for column in cursor.description or []]
+    rows, size, total = [], 0, 0
+    summaries = [ColumnSummary() for _ in columns]
+    keeping = True
+    complete = True
+    while True:
+        batch = cursor.fetchmany(FETCH_SIZE)
+        if not batch:
+            break
+        for row in batch:
+            total += 1
+            for summary, value in zip(summaries, row):
+                summary.add(value)
+            if keeping:
+                size += sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+                if len(rows) < MAX_ROWS and size <= MAX_BYTES:
+                    rows.append(row)
+                else:
+                    keeping = False
+        if total >= MAX_SCAN_ROWS:
+            complete = cursor.fetchone() is None
+            break
+    truncated = len(rows) < total or not complete
+    return QueryResult(columns, rows, total, complete, summaries if truncated else None)
+
+# --- Rendering ---
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken when its encoding is available, otherwise estimates
+    about four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False  # Don't retry (the encoding may need a download)
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def _cell(value) -> str:
+    text = "NULL" if value is None else str(value)
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS] + "..."
+
+def render(result: QueryResult, max_tokens=RESULT_TOKENS) -> str:
+    """
+    Renders a result for the final-answer prompt: a header line from the column names,
+    as many rows as fit in the token budget, and column summaries when rows were left out.
+    """
+    header = "Columns: " + " | ".join(result.columns)
+    total = f"{result.total_rows}" if result.complete else f"more than {result.total_rows}"
+    summary_lines = []
+    if result.summaries is not None:
+        summary_lines.append("Column summary (all rows):")
+        summary_lines += [f"- {name}: {summary.describe()}" for name, summary in zip(result.columns, result.summaries)]
+    budget = max_tokens - count_tokens(header) - count_tokens("\n".join(summary_lines)) - 20
+    lines = []
+    for row in result.rows:
+        line = " | ".join(_cell(value) for value in row)
+        cost = count_tokens(line) + 1
+        if cost > budget:
+            break
+        budget -= cost
+        lines.append(line)
+    parts = [header] + lines
+    if len(lines) < result.total_rows or not result.complete:
+        parts.append(f"(showing {len(lines)} of {total} rows)")
+    return "\n".join(parts + summary_lines)
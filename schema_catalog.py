@@ -0,0 +1,66 @@
+import hashlib
+import threading
+from collections import namedtuple
+from db_pool import get_pool, resolve_uri
+
+# --- Schema Snapshots ---
+# version: PRAGMA schema_version the snapshot was built at
+# schema: sorted CREATE TABLE statements joined by newlines
+# schema_hash: SHA256 of schema
+# tables: table name -> CREATE TABLE statement
+# columns: table name -> list of (column name, declared type)
+SchemaSnapshot = namedtuple("SchemaSnapshot", ["version", "schema", "schema_hash", "tables", "columns"])
+
+_snapshots = {}
+_lock = threading.Lock()
+
+def hash_text(text: str) -> str:
+    """
+    Computes a SHA256 hash of a string.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def get_snapshot(db_path) -> SchemaSnapshot:
+    """
+    Returns the schema of a database, rebuilding it only when SQLite's schema cookie
+    (PRAGMA schema_version) has moved since the last call. The cookie is bumped by
+    every CREATE/ALTER/DROP from any connection, so an unchanged schema costs one PRAGMA.
+    """
+    key = resolve_uri(db_path)[0]
+    with get_pool(db_path).connection() as conn:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        snapshot = _snapshots.get(key)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        # Read after the version so the rows are never older than the cookie we store
+        # SQLite's own tables (e.g. sqlite_stat1 from ANALYZE) aren't part of the user schema
+        rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND sql IS NOT NULL "
+                            "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'").fetchall()
+        tables = dict(rows)
+        columns = {
+            name: [(row[1], row[2]) for row in conn.execute("SELECT * FROM pragma_table_info(?)", (name,))]
+            for name in tables
+        }
+    # Sort the lines to reduce false mismatches due to order variations.
+    schema = "\n".join(sorted(tables.values()))
+    snapshot = SchemaSnapshot(version, schema, hash_text(schema), tables, columns)
+    with _lock:
+        _snapshots[key] = snapshot
+    return snapshot
+
+def user_tables(snapshot):
+    """
+    Returns the names of the tables holding user data, skipping SQLite's internal tables.
+    """
+    return sorted(name for name in snapshot.tables if not name.startswith("sqlite_"))
+
+def invalidate(db_path=None):
+    """
+    Drops the cached snapshot of a database (or of every database), e.g. right after
+    a load created a table.
+    """
+    with _lock:
+        if db_path is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(resolve_uri(db_path)[0], None)
@@ -0,0 +1,70 @@
+import time
+from collections import namedtuple
+from db_pool import get_pool, bootstrap
+
+# --- Configuration ---
+REFRESH_MODES = ("replace", "append", "upsert")
+
+SOURCES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sources (
+        url TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT,
+        mode TEXT NOT NULL DEFAULT 'replace',
+        key_column TEXT,
+        refresh_interval REAL,
+        checked_at REAL,
+        changed_at REAL
+    )
+    """,
+]
+
+# url: the loaded URL
+# table_name: the table its data lives in
+# etag / last_modified: validators from the last download, sent back in conditional GETs
+# content_hash: SHA256 of the last downloaded body (catches unchanged feeds without validators)
+# mode: how a changed feed is written, one of REFRESH_MODES
+# key_column: the column identifying a row, for "upsert"
+# refresh_interval: seconds between scheduled refreshes, None for manual refreshes only
+# checked_at / changed_at: time.time() of the last check and of the last change
+Source = namedtuple("Source", ["url", "table_name", "etag", "last_modified", "content_hash", "mode",
+                               "key_column", "refresh_interval", "checked_at", "changed_at"])
+
+_COLUMNS = ", ".join(Source._fields)
+
+# --- Registry Access ---
+def get_source(db_path, url):
+    """
+    Returns the registered Source for a URL, or None.
+    """
+    bootstrap(db_path, SOURCES_SCHEMA)
+    with get_pool(db_path).connection() as conn:
+        row = conn.execute(f"SELECT {_COLUMNS} FROM sources WHERE url = ?", (url,)).fetchone()
+    return Source(*row) if row else None
+
+def list_sources(db_path) -> list:
+    bootstrap(db_path, SOURCES_SCHEMA)
+    with get_pool(db_path).connection() as conn:
+        rows = conn.execute(f"SELECT {_COLUMNS} FROM sources ORDER BY url").fetchall()
+    return [Source(*row) for row in rows]
+
+def save_source(db_path, source):
+    """
+    Inserts or replaces a URL's registry entry.
+    """
+    bootstrap(db_path, SOURCES_SCHEMA)
+    with get_pool(db_path).connection() as conn:
+        conn.execute(f"INSERT OR REPLACE INTO sources ({_COLUMNS}) VALUES ({', '.join('?' * len(Source._fields))})",
+                     tuple(source))
+        conn.commit()
+
+def due_sources(db_path, now=None) -> list:
+    """
+    Returns the sources with a refresh_interval whose last check is older than it.
+    """
+    now = now or time.time()
+    return [source for source in list_sources(db_path)
+            if source.refresh_interval and (source.checked_at or 0) + source.refresh_interval <= now]
@@ -0,0 +1,190 @@
+import difflib
+import re
+import sqlite3
+
+import query_guard
+import schema_catalog
+
+# --- Configuration ---
+MAX_LOCAL_FIXES = 3          # Local repairs tried per query before the error goes back to the LLM
+SQL_RETRIES = 1              # LLM retries with the precise error when local repairs don't help
+NEAR_MISS_CUTOFF = 0.75      # Minimum similarity (difflib ratio) for replacing an unknown name
+MAX_ERROR_NAMES = 60         # Column or table names listed in the error sent back to the LLM
+
+# --- Identifiers ---
+# String literals and quoted identifiers (kept as single tokens), then bare words
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|[^\W\d]\w*")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+_BARE_NAME = re.compile(r"^[^\W\d]\w*$")
+_ALIAS = re.compile(r'\bAS\s+("(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[^\W\d]\w*)', re.IGNORECASE)
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def unquote(token: str) -> str:
+    if token[:1] in ('"', "`", "["):
+        return token[1:-1].replace('""', '"') if token[0] == '"' else token[1:-1]
+    return token
+
+def normalize(name: str) -> str:
+    """
+    Lowercases a name and drops spaces and underscores, so "Hire Date", "hire_date"
+    and "HireDate" compare equal.
+    """
+    return re.sub(r"[\s_]", "", name.lower())
+
+def closest(name: str, candidates) -> str:
+    """
+    Returns the candidate that best matches a misspelled name, or None when none is
+    close enough (see NEAR_MISS_CUTOFF).
+    """
+    normalized = {}
+    for candidate in candidates:
+        normalized.setdefault(normalize(candidate), candidate)
+    key = normalize(name)
+    if key in normalized:
+        return normalized[key]
+    match = difflib.get_close_matches(key, list(normalized), n=1, cutoff=NEAR_MISS_CUTOFF)
+    return normalized[match[0]] if match else None
+
+def replace_identifier(query: str, wrong: str, right: str) -> str:
+    """
+    Replaces every use of an identifier, bare or quoted, with the quoted right name.
+    String literals are left alone.
+    """
+    def replace(match):
+        token = match.group(0)
+        if token.startswith("'") or unquote(token).lower() != wrong.lower():
+            return token
+        return quote(right)
+    return _TOKEN.sub(replace, query)
+
+def quote_names(query: str, names) -> str:
+    """
+    Double-quotes the names with spaces or special characters that appear unquoted
+    in the query (e.g. SELECT Hire Date FROM ... becomes SELECT "Hire Date" FROM ...).
+    """
+    names = sorted((name for name in names if not _BARE_NAME.match(name)), key=len, reverse=True)
+    if not names:
+        return query
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(r"\s+".join(map(re.escape, name.split())) for name in names)
+                         + r")(?!\w)", re.IGNORECASE)
+    canonical = {" ".join(name.lower().split()): name for name in names}
+
+    def replace(text):
+        return pattern.sub(lambda match: quote(canonical[" ".join(match.group(0).lower().split())]), text)
+
+    parts, last = [], 0
+    for match in _LITERAL.finditer(query):
+        parts += [replace(query[last:match.start()]), match.group(0)]
+        last = match.end()
+    parts.append(replace(query[last:]))
+    return "".join(parts)
+
+# --- Schema Lookups ---
+def referenced_tables(query: str, snapshot, qualifier=None) -> list:
+    """
+    Returns the tables the query reads from (only the qualifier's table, if given
+    and known), or every user table when none can be told apart.
+    """
+    tables = schema_catalog.user_tables(snapshot)
+    references = query_guard.table_references(query, tables)
+    if qualifier and unquote(qualifier).lower() in references:
+        return [references[unquote(qualifier).lower()]]
+    return sorted(set(references.values())) or tables
+
+def defined_aliases(query: str, snapshot) -> set:
+    """
+    Returns the lowercased aliases the query defines (AS names and table aliases).
+    They are the query's own names, so they are never "fixed" into columns.
+    """
+    without_strings = re.sub(r"'(?:[^']|'')*'", "''", query)
+    aliases = {unquote(alias).lower() for alias in _ALIAS.findall(without_strings)}
+    tables = schema_catalog.user_tables(snapshot)
+    names = {table.lower() for table in tables}
+    aliases.update(name for name in query_guard.table_references(query, tables) if name not in names)
+    return aliases
+
+def column_names(snapshot, tables) -> list:
+    return [column for table in tables for column, _ in snapshot.columns.get(table, [])]
+
+def all_names(snapshot) -> list:
+    tables = schema_catalog.user_tables(snapshot)
+    return tables + column_names(snapshot, tables)
+
+# --- Validation ---
+def explain_error(conn, query: str):
+    """
+    Compiles the query with EXPLAIN, which resolves every table and column against
+    the live schema without running it. Returns SQLite's error message, or None.
+    """
+    try:
+        conn.execute(f"EXPLAIN {query}").close()
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        return str(e)
+    return None
+
+def _error_name(error: str, prefix: str):
+    """
+    Splits "no such column: e.Salry" into ("e", "Salry").
+    """
+    if not error.lower().startswith(prefix):
+        return None, None
+    qualifier, _, name = error[len(prefix):].strip().rpartition(".")
+    return qualifier or None, name
+
+def repair(query: str, error: str, snapshot):
+    """
+    Tries one local fix for a compile error: quoting names with spaces (whose bare
+    words SQLite reads as separate tokens), then replacing an unknown column or table
+    with its nearest match. Returns the fixed query, or None.
+    """
+    quoted = quote_names(query, all_names(snapshot))
+    if quoted != query:
+        return quoted
+    qualifier, name = _error_name(error, "no such column:")
+    if name and name.lower() in defined_aliases(query, snapshot):
+        return None  # e.g. an alias used where SQLite can't see it; only the LLM can restructure that
+    if name:
+        right = closest(name, column_names(snapshot, referenced_tables(query, snapshot, qualifier)))
+        return replace_identifier(query, name, right) if right else None
+    _, name = _error_name(error, "no such table:")
+    if name:
+        right = closest(name, schema_catalog.user_tables(snapshot))
+        return replace_identifier(query, name, right) if right else None
+    return None
+
+def describe_error(error: str, query: str, snapshot) -> str:
+    """
+    Extends SQLite's error with the names the LLM could have meant: the columns of
+    the queried tables for an unknown column, the closest tables for an unknown table.
+    """
+    qualifier, name = _error_name(error, "no such column:")
+    if name:
+        names = [f"{quote(table)}.{quote(column)}" for table in referenced_tables(query, snapshot, qualifier)
+                 for column, _ in snapshot.columns.get(table, [])]
+        return f"{error}. Columns of the queried tables: " + ", ".join(names[:MAX_ERROR_NAMES])
+    _, name = _error_name(error, "no such table:")
+    if name:
+        tables = schema_catalog.user_tables(snapshot)
+        candidates = difflib.get_close_matches(name, tables, n=5, cutoff=0.3) or tables[:MAX_ERROR_NAMES]
+        return f"{error}. Available tables include: " + ", ".join(quote(table) for table in candidates)
+    return error
+
+def check(conn, query: str, snapshot, max_fixes=MAX_LOCAL_FIXES):
+    """
+    Validates a generated query before it runs and applies up to max_fixes local
+    fixes (see repair). A query that compiles is returned unchanged: a double-quoted
+    name SQLite doesn't know may well be a string literal, and rewriting it would
+    change what the query means.
+    Returns (query, error, fixes): the possibly fixed query, the described error
+    still left (None when the query compiles) and the number of fixes applied.
+    """
+    fixes = 0
+    error = explain_error(conn, query)
+    while error and fixes < max_fixes:
+        fixed = repair(query, error, snapshot)
+        if fixed is None or fixed == query:
+            break
+        query, error, fixes = fixed, explain_error(conn, fixed), fixes + 1
+    return query, describe_error(error, query, snapshot) if error else None, fixes
@@ -17,12 +17,40 @@ document.addEventListener("DOMContentLoaded", function () {
       chatContainer.scrollTop = chatContainer.scrollHeight;
     }
   
+    // Poll a background job until it finishes and resolve with its final status
+    function waitForJob(jobId, interval = 1000) {
+      return new Promise((resolve, reject) => {
+        function poll() {
+          fetch(`/jobs/${jobId}`)
+            .then(response => {
+              if (!response.ok) throw new Error("Network response was not ok");
+              return response.json();
+            })
+            .then(job => {
+              if (job.status === "done" || job.status === "failed") {
+                resolve(job);
+              } else {
+                setTimeout(poll, interval);
+              }
+            })
+            .catch(reject);
+        }
+        poll();
+      });
+    }
+  
     // Toggle token input visibility based on checkbox
     authCheckbox.addEventListener("change", function () {
       tokenInput.style.display = this.checked ? "block" : "none";
     });
   
-    // Handle chat form submission
+    // Progress text shown until the first answer token arrives
+    const statusText = {
+      sql_generated: "Running query...",
+      query_executed: "Writing answer..."
+    };
+  
+    // Handle chat form submission; the answer is streamed as server-sent events
     chatForm.addEventListener("submit", function (e) {
       e.preventDefault();
       const message = chatInput.value.trim();
@@ -32,24 +60,56 @@ document.addEventListener("DOMContentLoaded", function () {
       const formData = new URLSearchParams();
       formData.append("query", message);
   
-      fetch("/", {
+      const agentElem = document.createElement("div");
+      agentElem.classList.add("message", "agent");
+      agentElem.textContent = "Generating SQL...";
+      chatContainer.appendChild(agentElem);
+      chatContainer.scrollTop = chatContainer.scrollHeight;
+      let answer = "";
+  
+      function handleEvent(event) {
+        if (event.type === "status" && !answer) {
+          agentElem.textContent = statusText[event.data] || agentElem.textContent;
+        } else if (event.type === "token") {
+          answer += event.data;
+          agentElem.textContent = answer.trimStart();
+        } else if (event.type === "error") {
+          agentElem.textContent = event.data;
+        }
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+      }
+  
+      fetch("/chat/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/x-www-form-urlencoded",
-          "X-Requested-With": "XMLHttpRequest"
+          "Accept": "text/event-stream"
         },
         body: formData
       })
       .then(response => {
-        if (!response.ok) throw new Error("Network response was not ok");
-        return response.json();
-      })
-      .then(data => {
-        appendMessage(data.result, "agent");
+        if (!response.ok || !response.body) throw new Error("Network response was not ok");
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        function read() {
+          return reader.read().then(({ done, value }) => {
+            if (done) return;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split("\n\n");
+            buffer = events.pop(); // Keep any partial event for the next chunk
+            events.forEach(raw => {
+              const line = raw.split("\n").find(l => l.startsWith("data: "));
+              if (line) handleEvent(JSON.parse(line.slice(6)));
+            });
+            return read();
+          });
+        }
+        return read();
       })
       .catch(error => {
         console.error("Error:", error);
-        appendMessage("Error retrieving agent response.", "agent");
+        agentElem.textContent = "Error retrieving agent response.";
       });
     });
   
@@ -57,11 +117,13 @@ document.addEventListener("DOMContentLoaded", function () {
     urlForm.addEventListener("submit", function (e) {
       e.preventDefault();
       const urlInput = document.getElementById("documentUrl");
-      const urlValue = urlInput.value.trim();
-      if (!urlValue) return;
-      appendMessage("Uploading document...", "user");
+      const urls = urlInput.value.split("\n").map(url => url.trim()).filter(url => url);
+      if (!urls.length) return;
+      // Several URLs are loaded as one batch job with a result per URL
+      const batch = urls.length > 1;
+      appendMessage(batch ? `Uploading ${urls.length} documents...` : "Uploading document...", "user");
       const formData = new URLSearchParams();
-      formData.append("documentUrl", urlValue);
+      formData.append(batch ? "documentUrls" : "documentUrl", urls.join("\n"));
       if (authCheckbox.checked) {
         const tokenValue = document.getElementById("oauthToken").value.trim();
         if (tokenValue) {
@@ -72,7 +134,7 @@ document.addEventListener("DOMContentLoaded", function () {
         }
       }
   
-      fetch("/", {
+      fetch(batch ? "/upload/batch" : "/", {
         method: "POST",
         headers: {
           "Content-Type": "application/x-www-form-urlencoded",
@@ -85,7 +147,6 @@ document.addEventListener("DOMContentLoaded", function () {
         return response.json();
       })
       .then(data => {
-        appendMessage(data.result, "agent");
         urlInput.value = "";
         if (authCheckbox.checked) {
           document.getElementById("oauthToken").value = ""; // Clear token
@@ -93,6 +154,14 @@ document.addEventListener("DOMContentLoaded", function () {
         const urlModalElem = document.getElementById("urlModal");
         const urlModal = bootstrap.Modal.getInstance(urlModalElem);
         if (urlModal) urlModal.hide();
+        return waitForJob(data.job_id);
+      })
+      .then(job => {
+        if (batch && Array.isArray(job.result)) {
+          job.result.forEach(item => appendMessage(`${item.url}: ${item.result}`, "agent"));
+        } else {
+          appendMessage(job.result, "agent");
+        }
       })
       .catch(error => {
         console.error("Error:", error);
@@ -0,0 +1,161 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from db_pool import get_pool, resolve_uri
+
+# --- Configuration ---
+TOP_K_TABLES = 5              # Tables passed to SQL generation per question
+SAMPLE_VALUES = 50            # Distinct values sampled per text column
+SAMPLE_COLUMNS = 40           # Text columns sampled per table
+COLUMN_WEIGHT = 3             # Table/column name tokens count this many times vs sampled values
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# --- Tokenization ---
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def tokenize(text) -> list:
+    """
+    Splits text into lowercase word tokens, breaking camelCase, snake_case and dotted
+    names apart and adding a crude singular form ("salaries" -> "salary").
+    """
+    tokens = []
+    for word in _WORD.findall(_CAMEL.sub(r"\1 \2", str(text)).lower()):
+        tokens.append(word)
+        if len(word) > 4 and word.endswith("ies"):
+            tokens.append(word[:-3] + "y")
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            tokens.append(word[:-1])
+    return tokens
+
+# --- Table Index ---
+class TableIndex:
+    """
+    Local BM25 index over table names, column names and sampled distinct values,
+    used to pick the tables relevant to a question. No network access is needed.
+    Tables are added and removed one at a time, so uploads only index the new table.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._docs = {}          # table name -> Counter of token frequencies
+        self._lengths = {}       # table name -> document length
+        self._df = Counter()     # token -> number of tables containing it
+        self._lock = threading.Lock()
+
+    def __contains__(self, table):
+        return table in self._docs
+
+    def _document(self, table, columns):
+        terms = Counter()
+        for token in tokenize(table):
+            terms[token] += COLUMN_WEIGHT
+        for column, _ in columns:
+            for token in tokenize(column):
+                terms[token] += COLUMN_WEIGHT
+        text_columns = [column for column, dtype in columns if not dtype or "TEXT" in dtype.upper()]
+        quoted_table = '"' + table.replace('"', '""') + '"'
+        try:
+            with get_pool(self.db_path, read_only=True).connection() as conn:
+                for column in text_columns[:SAMPLE_COLUMNS]:
+                    quoted = '"' + column.replace('"', '""') + '"'
+                    cursor = conn.execute(
+                        f'SELECT DISTINCT {quoted} FROM {quoted_table} WHERE {quoted} IS NOT NULL LIMIT {SAMPLE_VALUES}'
+                    )
+                    for (value,) in cursor:
+                        terms.update(tokenize(value))
+        except sqlite3.Error:
+            pass  # Names alone are still a useful document
+        return terms
+
+    def add_table(self, table, columns):
+        """
+        Indexes (or re-indexes) one table given its (column, type) pairs.
+        """
+        terms = self._document(table, columns)
+        with self._lock:
+            self._remove(table)
+            self._docs[table] = terms
+            self._lengths[table] = sum(terms.values())
+            self._df.update(terms.keys())
+
+    def remove_table(self, table):
+        with self._lock:
+            self._remove(table)
+
+    def _remove(self, table):
+        terms = self._docs.pop(table, None)
+        if terms is not None:
+            self._lengths.pop(table)
+            self._df.subtract(terms.keys())
+
+    def sync(self, snapshot, tables):
+        """
+        Brings the index in line with a schema snapshot: new tables are indexed and
+        dropped ones removed. A no-op when nothing changed.
+        """
+        for table in set(self._docs) - set(tables):
+            self.remove_table(table)
+        for table in tables:
+            if table not in self._docs:
+                self.add_table(table, snapshot.columns.get(table, []))
+
+    def scores(self, question) -> dict:
+        """
+        Returns the BM25 score of every indexed table for a question.
+        """
+        query = set(tokenize(question))
+        with self._lock:
+            count = len(self._docs)
+            if not count:
+                return {}
+            average = sum(self._lengths.values()) / count
+            scores = {}
+            for table, terms in self._docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[table] / (average or 1))
+                score = 0.0
+                for token in query:
+                    tf = terms.get(token)
+                    if tf:
+                        idf = math.log(1 + (count - self._df[token] + 0.5) / (self._df[token] + 0.5))
+                        score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                scores[table] = score
+        return scores
+
+    def select(self, question, tables, k=TOP_K_TABLES) -> list:
+        """
+        Picks the k tables most relevant to a question, in their original order.
+        When nothing matches, the k most recently listed tables are returned.
+        """
+        if len(tables) <= k:
+            return list(tables)
+        scores = self.scores(question)
+        ranked = sorted((t for t in tables if scores.get(t, 0) > 0), key=lambda t: -scores[t])[:k]
+        if not ranked:
+            return list(tables)[-k:]
+        chosen = set(ranked)
+        return [table for table in tables if table in chosen]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(db_path) -> TableIndex:
+    """
+    Returns the process-wide table index for a database.
+    """
+    key = resolve_uri(db_path)[0]
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = TableIndex(db_path)
+        return index
+
+def index_table(db_path, table):
+    """
+    Indexes a freshly loaded table so the next question can already find it.
+    """
+    with get_pool(db_path).connection() as conn:
+        columns = [(row[1], row[2]) for row in conn.execute("SELECT * FROM pragma_table_info(?)", (table,))]
+    get_index(db_path).add_table(table, columns)
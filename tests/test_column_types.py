@@ -0,0 +1,47 @@
+import pandas as pd
+
+from load_file_from_url import convert_column, infer_column_type
+
+
+def column(*values):
+    return pd.Series(list(values), dtype=object)
+
+
+def stored(*values):
+    series = column(*values)
+    column_type = infer_column_type(series)
+    return column_type.kind, convert_column(series, column_type).tolist()
+
+
+def test_single_letter_codes_stay_text():
+    assert stored("F", "F", "F") == ("text", ["F", "F", "F"])
+    assert stored("Y", "N") == ("text", ["Y", "N"])
+
+
+def test_boolean_needs_a_true_and_a_false_value():
+    assert stored("NO", "no") == ("text", ["NO", "no"])
+    assert stored("yes", "No", "TRUE") == ("boolean", [1, 0, 1])
+
+
+def test_numbers_that_would_not_print_back_stay_text():
+    assert stored("1.10", "2.5") == ("text", ["1.10", "2.5"])
+    assert stored("+5", "6") == ("text", ["+5", "6"])
+    assert stored("1.5", "2.25", "3") == ("real", [1.5, 2.25, 3])
+    assert stored("3", "4") == ("integer", [3, 4])
+
+
+def test_later_values_that_would_not_print_back_are_kept():
+    column_type = infer_column_type(column("1", "2"))
+    assert convert_column(column("3", "4.0", "n/a", None), column_type).tolist() == [3, "4.0", "n/a", None]
+
+
+def test_partial_iso_dates_stay_text():
+    assert stored("2020-1", "2021-2") == ("text", ["2020-1", "2021-2"])
+    assert stored("2020-01-05", "2021-02-03") == ("date", ["2020-01-05", "2021-02-03"])
+
+
+def test_date_column_keeps_a_later_time_of_day():
+    values = ["2024-01-01 00:00:00"] * 300 + ["2024-02-01 13:45:10"]
+    kind, converted = stored(*values)
+    assert kind == "datetime"
+    assert converted[-1] == "2024-02-01 13:45:10"
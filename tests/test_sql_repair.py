@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import schema_catalog
+import sql_repair
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE emp (Name TEXT, Salary INTEGER, Dept TEXT, "Hire Date" TEXT)')
+    conn.commit()
+    yield conn, schema_catalog.get_snapshot(path)
+    conn.close()
+    schema_catalog.invalidate(path)
+
+
+def test_near_miss_column_is_fixed(database):
+    conn, snapshot = database
+    query, error, fixes = sql_repair.check(conn, "SELECT Salry FROM emp", snapshot)
+    assert (query, error, fixes) == ('SELECT "Salary" FROM emp', None, 1)
+
+
+def test_names_with_spaces_are_quoted(database):
+    conn, snapshot = database
+    query, error, _ = sql_repair.check(conn, "SELECT Hire Date FROM emp", snapshot)
+    assert (query, error) == ('SELECT "Hire Date" FROM emp', None)
+
+
+def test_query_that_compiles_is_not_rewritten(database):
+    conn, snapshot = database
+    query = 'SELECT COUNT(*) FROM emp WHERE Name = "Nme"'
+    assert sql_repair.check(conn, query, snapshot) == (query, None, 0)
+
+
+def test_aliases_are_never_rewritten(database):
+    conn, snapshot = database
+    # avg_salary is close enough to Salary to be "fixed", which would change the query
+    query = ("WITH d AS (SELECT Dept, AVG(Salary) AS avg_salary FROM emp GROUP BY Dept) "
+             "SELECT Name FROM emp WHERE Salary > avg_salary")
+    fixed, error, fixes = sql_repair.check(conn, query, snapshot)
+    assert (fixed, fixes) == (query, 0)
+    assert error.startswith("no such column: avg_salary")
+
+
+def test_table_aliases_are_never_rewritten(database):
+    conn, snapshot = database
+    query = "SELECT salar FROM emp AS salar"
+    fixed, error, fixes = sql_repair.check(conn, query, snapshot)
+    assert (fixed, fixes) == (query, 0)
+    assert error.startswith("no such column: salar")
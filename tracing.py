@@ -0,0 +1,216 @@
+import cProfile
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# --- Configuration ---
+TRACING = True                 # Record per-stage wall times and LLM token counts
+PROFILE_SLOW_REQUESTS = False  # Run each traced request under cProfile and keep the slow ones
+SLOW_REQUEST_SECONDS = 5.0     # Requests slower than this keep their profile
+PROFILE_DIR = "profiles"       # Where slow-request profiles are written (.prof, for pstats/snakeviz)
+MAX_PROFILES = 50              # Oldest profiles beyond this are deleted
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = "chatbot"
+
+# --- Histograms ---
+class Histogram:
+    """
+    Cumulative-bucket latency histogram, as Prometheus expects it.
+    """
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+_histograms = {}   # (pipeline, stage) -> Histogram
+_tokens = {}       # (pipeline, stage, kind) -> count, kind being "prompt" or "completion"
+_events = {}       # (pipeline, event) -> count, e.g. LLM calls and SQL check outcomes
+_lock = threading.Lock()
+
+def observe(pipeline, stage, seconds):
+    with _lock:
+        histogram = _histograms.get((pipeline, stage))
+        if histogram is None:
+            histogram = _histograms[(pipeline, stage)] = Histogram()
+        histogram.observe(seconds)
+
+def record_tokens(pipeline, stage, message):
+    """
+    Adds the token usage an LLM reply reports (usage_metadata, or the OpenAI
+    token_usage in response_metadata) to the stage's counters.
+    """
+    if not TRACING:
+        return
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        prompt, completion = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    else:
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    if not prompt and not completion:
+        return
+    with _lock:
+        for kind, count in (("prompt", prompt), ("completion", completion)):
+            _tokens[(pipeline, stage, kind)] = _tokens.get((pipeline, stage, kind), 0) + count
+
+def count(pipeline, event, n=1):
+    """
+    Adds to an event counter. Ratios of counters give rates, e.g. LLM calls per question.
+    """
+    if not TRACING:
+        return
+    with _lock:
+        _events[(pipeline, event)] = _events.get((pipeline, event), 0) + n
+
+# --- Stage Timing ---
+@contextmanager
+def _timed(pipeline, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(pipeline, stage, time.perf_counter() - start)
+
+_disabled = nullcontext()
+
+def stage(pipeline, name):
+    """
+    Context manager timing one stage, e.g. `with stage("agent", "final_answer"):`.
+    Works around awaits too. With TRACING off it is a shared no-op.
+    """
+    return _timed(pipeline, name) if TRACING else _disabled
+
+def traced(pipeline, name):
+    """
+    Decorator timing every call of a function (or coroutine function) as a stage.
+    """
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not TRACING:
+                    return await func(*args, **kwargs)
+                with _timed(pipeline, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACING:
+                return func(*args, **kwargs)
+            with _timed(pipeline, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def timed_iter(pipeline, name, iterable):
+    """
+    Yields from an iterable, timing only the time spent producing each item (e.g.
+    download and parsing of streamed chunks, not the caller's work between them).
+    """
+    if not TRACING:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            observe(pipeline, name, time.perf_counter() - start)
+            return
+        observe(pipeline, name, time.perf_counter() - start)
+        yield item
+
+# --- Requests and Slow-Request Profiles ---
+_profiling = threading.Lock()  # One profiled request at a time
+
+def _save_profile(profiler, pipeline):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{pipeline}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.prof")
+    profiler.dump_stats(path)
+    profiles = sorted(os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".prof"))
+    for old in profiles[:max(0, len(profiles) - MAX_PROFILES)]:
+        os.remove(old)
+
+@contextmanager
+def trace_request(pipeline):
+    """
+    Times a whole request as the pipeline's "total" stage. With PROFILE_SLOW_REQUESTS,
+    the request also runs under cProfile and the profile is written to PROFILE_DIR
+    when it took longer than SLOW_REQUEST_SECONDS. cProfile only sees the thread that
+    entered the block (for the async agent, the event loop thread, where concurrent
+    requests may show up too), and only one request is profiled at a time.
+    """
+    if not TRACING:
+        yield
+        return
+    profiler = None
+    if PROFILE_SLOW_REQUESTS and _profiling.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(pipeline, "total", elapsed)
+        if profiler is not None:
+            profiler.disable()
+            try:
+                if elapsed > SLOW_REQUEST_SECONDS:
+                    _save_profile(profiler, pipeline)
+            finally:
+                _profiling.release()
+
+# --- Prometheus Exposition ---
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+def render_metrics() -> str:
+    """
+    Renders the histograms and token counters in the Prometheus text format.
+    """
+    with _lock:
+        histograms = {key: (list(h.counts), h.sum, h.count) for key, h in _histograms.items()}
+        tokens = dict(_tokens)
+        events = dict(_events)
+    name = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [f"# HELP {name} Wall time of each pipeline stage.", f"# TYPE {name} histogram"]
+    for (pipeline, stage_name), (counts, total, count) in sorted(histograms.items()):
+        labels = _labels(pipeline=pipeline, stage=stage_name)
+        cumulative = 0
+        for bound, n in zip(list(BUCKETS) + ["+Inf"], counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+    name = f"{METRIC_PREFIX}_llm_tokens_total"
+    lines += [f"# HELP {name} Tokens sent to and received from the LLM per stage.", f"# TYPE {name} counter"]
+    for (pipeline, stage_name, kind), count in sorted(tokens.items()):
+        lines.append(f"{name}{{{_labels(pipeline=pipeline, stage=stage_name, kind=kind)}}} {count}")
+    name = f"{METRIC_PREFIX}_events_total"
+    lines += [f"# HELP {name} Pipeline events, such as LLM calls, questions and SQL check outcomes.",
+              f"# TYPE {name} counter"]
+    for (pipeline, event), n in sorted(events.items()):
+        lines.append(f"{name}{{{_labels(pipeline=pipeline, event=event)}}} {n}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _tokens.clear()
+        _events.clear()